@@ -0,0 +1,178 @@
+"""
+The analyses of the app as plain functions, usable without a Streamlit runtime from
+a batch job, a notebook or a benchmark. The pages call these too.
+
+    from analytics.api import load_players, player_percentiles
+    df = load_players('wyscout')
+    player_percentiles(df, 'Championship 1', '2024/2025', 'Winger', 'A. Player', api='wyscout')
+
+Every function takes a frame from load_players (or any frame with the provider's
+columns) and the provider's api name, 'statbomb' or 'wyscout'. Positions are given
+as offered in the UI. Nothing is reported through Streamlit: bad input, unknown
+players and missing data raise ValueError, missing credentials included.
+"""
+import pandas as pd
+from data.datasets import dataset_view, get_dataset
+from utilities.chart_cache import get_chart_image
+from utilities.leaderboard import get_weighted_leaderboard
+from utilities.utils import get_metrics_by_position, get_percentile_cube, get_player_season_query, league_rankings, resolve_position
+from utilities.statbomb_default_metrics import profiles_zcore as statbomb_profiles
+from utilities.wyscout_default_metrics import profiles_zcore as wyscout_profiles
+from visualizations.batch_charts import api_by_provider, chart_params
+from visualizations.overall_rank import get_leaderboard, get_overall_rank
+from visualizations.pizza_chart import create_pizza_chart
+from visualizations.radar_chart import create_radar_chart
+from visualizations.similarity_chart import filter_similar_players
+from visualizations.svg_charts import create_pizza_svg, create_radar_svg
+from visualizations.weighted_rank import get_weighted_rank
+from visualizations.zscore_ranking import get_xg_outperformance, top_10_players_by_profile
+
+zscore_profiles = {
+    'statbomb': statbomb_profiles,
+    'wyscout': wyscout_profiles,
+}
+
+# Charts by name and image format, the SVG ones filled into a template rather than
+# drawn by matplotlib
+chart_functions = {
+    ('pizza', 'png'): ('pizza', create_pizza_chart),
+    ('pizza', 'svg'): ('pizza-svg', create_pizza_svg),
+    ('radar', 'png'): ('radar', create_radar_chart),
+    ('radar', 'svg'): ('radar-svg', create_radar_svg),
+}
+
+
+def position_metrics(position, api='statbomb'):
+    """
+    The metrics charted and ranked for a position, raising ValueError for positions
+    without any.
+    """
+    try:
+        return get_metrics_by_position(position, api)
+    except KeyError:
+        raise ValueError(f"No metrics for position '{position}'")
+
+
+def load_players(provider, league=None, season=None):
+    """
+    The player-season data of provider ('statsbomb' or 'wyscout'), optionally only one
+    league and season. The frame is shared with every other caller in the process and
+    must be treated as read-only.
+    """
+    if provider not in api_by_provider:
+        raise ValueError(f"Unknown provider '{provider}', expected statsbomb or wyscout")
+    return dataset_view(get_dataset(provider), league, season)
+
+
+def player_percentiles(df, league, season, position, player_name, api='statbomb'):
+    """
+    The player's value and percentile in every metric of the position, next to the
+    percentile of the position's average, as shown by the pizza and radar charts.
+
+    Returns:
+        pd.DataFrame: One row per metric with 'Metric', 'Value', 'Percentile' and
+        'Position Average'.
+    """
+    metrics = position_metrics(position, api)
+    position = resolve_position(position, api)
+
+    cube = get_percentile_cube(df, api)
+    percentiles = cube.player_percentiles(player_name, league, season, position, metrics)
+    if percentiles is None or percentiles.empty:
+        raise ValueError(f'Player {player_name} not found.')
+    values = get_player_season_query(df, api).player_rows(player_name, league, season, position)
+    averages = cube.average_percentiles(league, season, position, metrics)
+
+    return pd.DataFrame({
+        'Metric': metrics,
+        'Value': values[metrics].iloc[0].to_numpy(),
+        'Percentile': percentiles[metrics].iloc[0].to_numpy(),
+        'Position Average': averages[metrics].iloc[0].to_numpy(),
+    })
+
+
+def overall_rank(df, league, season, position, api='statbomb', top_n=None):
+    """
+    Players of a league, season and position by their average percentile, best first.
+    """
+    position_metrics(position, api)
+    return get_overall_rank(df, league, season, position, api, top_n).reset_index(drop=True)
+
+
+def leaderboard(df, season, positions=None, k=10, api='statbomb'):
+    """
+    The best k players of every league and position of a season, see get_leaderboard.
+    """
+    return get_leaderboard(df, season, positions=positions, k=k, api=api)
+
+
+def weighted_rank(df, league='All', season='', position=None, reference_league='League Two', api='statbomb',
+                  min_minutes=None, max_age=None, n=None, sort_by='Overall Score'):
+    """
+    Overall scores and scores weighted by league strength relative to reference_league,
+    for every player matching the filters, best first.
+    """
+    if reference_league not in league_rankings:
+        raise ValueError(f"No league coefficient for '{reference_league}'")
+    return get_weighted_leaderboard(df, api).scores(
+        league, season, position, reference_league=reference_league,
+        min_minutes=min_minutes, max_age=max_age, n=n, sort_by=sort_by
+    )
+
+
+def player_weighted_rank(df, league, season, position, player_name, api='statbomb'):
+    """
+    The player's overall score and score weighted against League Two.
+    """
+    rank = get_weighted_rank(df, player_name, league, season, position, api)
+    if rank.empty:
+        raise ValueError(f'Player {player_name} not found.')
+    return rank
+
+
+def zscore_profile_names(position, api='statbomb'):
+    """
+    The z-score profiles of a position, e.g. the kinds of centre back.
+    """
+    if position not in zscore_profiles[api]:
+        raise ValueError(f"No z-score profiles for position '{position}'")
+    return [profile["Profile Name"] for profile in zscore_profiles[api][position]]
+
+
+def zscore_profile(df, league, season, position, profile_name, api='statbomb', min_minutes=None):
+    """
+    The ten highest scoring players of the league-season for one z-score profile.
+    """
+    return top_10_players_by_profile(league, season, position, profile_name, df, api, min_minutes=min_minutes)
+
+
+def xg_outperformance(df, league='All', season='', min_minutes=0, n=10, api='statbomb'):
+    """
+    Centre forwards scoring the most non-penalty goals above their xG, see
+    get_xg_outperformance.
+    """
+    return get_xg_outperformance(df, league, season, min_minutes, n, api)
+
+
+def similar_players(df, league, season, position, player_name, similarity_threshold=0.9, max_age=30, api='statbomb'):
+    """
+    Players of the same peer group with a profile similar to the player's, most similar
+    first, see filter_similar_players.
+    """
+    similar = filter_similar_players(df, player_name, league, season, position, similarity_threshold, max_age, api)
+    return similar.sort_values('Similarity', ascending=False).reset_index(drop=True)
+
+
+def render_chart(df, chart, league, season, position, player_name, api='statbomb', image_format='png'):
+    """
+    A pizza or radar chart of the player as PNG or SVG bytes, served from the chart
+    cache when rendered before.
+    """
+    if (chart, image_format) not in chart_functions:
+        raise ValueError(f"Unknown chart '{chart}' as '{image_format}', expected pizza or radar as png or svg")
+    name, create_chart = chart_functions[(chart, image_format)]
+    image = get_chart_image(df, name, create_chart, *chart_params(chart, player_name, league, season, position),
+                            api=api, image_format=image_format)
+    if image is None:
+        raise ValueError(f'Player {player_name} not found.')
+    return image
@@ -0,0 +1,136 @@
+"""
+Runs the analyses of analytics.api from the command line, without Streamlit.
+
+Usage:
+    python -m analytics.cli load wyscout --league "Championship 1" --season 2024/2025 --output players.csv
+    python -m analytics.cli percentiles wyscout --league "Championship 1" --season 2024/2025 --position Winger --player "A. Player"
+    python -m analytics.cli overall-rank statsbomb --league "League One" --season 2024/2025 --position "Full Back" --top 20
+    python -m analytics.cli leaderboard wyscout --season 2024/2025 --k 5
+    python -m analytics.cli weighted-rank statsbomb --season 2024/2025 --reference-league "League One" --top 50
+    python -m analytics.cli zscore wyscout --league "Championship 1" --season 2024/2025 --position "Centre Back" --profile "Ball Playing CB"
+    python -m analytics.cli similar wyscout --league "Championship 1" --season 2024/2025 --position Winger --player "A. Player"
+    python -m analytics.cli chart wyscout pizza --league "Championship 1" --season 2024/2025 --position Winger --player "A. Player" --output pizza.svg
+
+Tables are written as CSV to --output, or to stdout. zscore without --profile lists
+the profiles of the position. Charts are PNG, or SVG when --output ends in .svg.
+Data is loaded as in the app, so a StatsBomb snapshot older than its refresh age is
+rebuilt from the API with the SB_USERNAME and SB_PASSWORD credentials.
+"""
+import argparse
+import sys
+from analytics.api import (
+    leaderboard, load_players, overall_rank, player_percentiles, player_weighted_rank, render_chart,
+    similar_players, weighted_rank, zscore_profile, zscore_profile_names,
+)
+from visualizations.batch_charts import api_by_provider
+
+
+def write_table(df, output):
+    if output:
+        df.to_csv(output, index=False)
+    else:
+        df.to_csv(sys.stdout, index=False)
+
+
+def run_command(args):
+    """
+    Runs one parsed command, returning the table to write or None when it wrote its
+    own output.
+    """
+    api = api_by_provider[args.provider]
+
+    if args.command == 'load':
+        return load_players(args.provider, args.league, args.season)
+    if args.command == 'leaderboard':
+        df = load_players(args.provider, season=args.season)
+        return leaderboard(df, args.season, positions=args.positions, k=args.k, api=api)
+    if args.command == 'weighted-rank':
+        df = load_players(args.provider, args.league, args.season)
+        if args.player:
+            return player_weighted_rank(df, args.league, args.season, args.position, args.player, api)
+        return weighted_rank(df, args.league, args.season, args.position, args.reference_league, api,
+                             min_minutes=args.min_minutes, max_age=args.max_age, n=args.top, sort_by=args.sort_by)
+    if args.command == 'zscore' and not args.profile:
+        print("\n".join(zscore_profile_names(args.position, api)))
+        return None
+
+    df = load_players(args.provider, args.league, args.season)
+    if args.command == 'percentiles':
+        return player_percentiles(df, args.league, args.season, args.position, args.player, api)
+    if args.command == 'overall-rank':
+        return overall_rank(df, args.league, args.season, args.position, api, top_n=args.top)
+    if args.command == 'zscore':
+        return zscore_profile(df, args.league, args.season, args.position, args.profile, api, min_minutes=args.min_minutes)
+    if args.command == 'similar':
+        return similar_players(df, args.league, args.season, args.position, args.player,
+                               similarity_threshold=args.threshold / 100, max_age=args.max_age, api=api)
+
+    image_format = 'svg' if args.output.lower().endswith('.svg') else 'png'
+    image = render_chart(df, args.chart, args.league, args.season, args.position, args.player, api, image_format)
+    with open(args.output, 'wb') as f:
+        f.write(image)
+    print(f"{args.chart} chart of {args.player} -> {args.output}")
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the player analyses outside the app.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_command(name, help, league=True, position=False, player=False, output=True):
+        command = commands.add_parser(name, help=help)
+        command.add_argument('provider', choices=list(api_by_provider))
+        if league:
+            command.add_argument('--league', default='All', help="'All' for every league")
+        command.add_argument('--season', default='', help="e.g. 2024/2025, every season when empty")
+        if position:
+            command.add_argument('--position', required=position == 'required')
+        if player:
+            command.add_argument('--player', required=player == 'required')
+        if output:
+            command.add_argument('--output', help="CSV file, stdout when empty")
+        return command
+
+    add_command('load', "player-season data")
+    add_command('percentiles', "a player's percentiles", position='required', player='required')
+    command = add_command('overall-rank', "players by overall score", position='required')
+    command.add_argument('--top', type=int, default=None)
+
+    command = add_command('leaderboard', "best players of every league and position", league=False)
+    command.add_argument('--positions', nargs='+', default=None)
+    command.add_argument('--k', type=int, default=10, help="players per league and position")
+
+    command = add_command('weighted-rank', "overall and league-weighted scores", position=True, player=True)
+    command.add_argument('--reference-league', default='League Two')
+    command.add_argument('--min-minutes', type=int, default=None)
+    command.add_argument('--max-age', type=int, default=None)
+    command.add_argument('--top', type=int, default=None)
+    command.add_argument('--sort-by', choices=['Overall Score', 'Weighted Score'], default='Overall Score')
+
+    command = add_command('zscore', "best players for a z-score profile", position='required')
+    command.add_argument('--profile')
+    command.add_argument('--min-minutes', type=int, default=None)
+
+    command = add_command('similar', "players similar to a player", position='required', player='required')
+    command.add_argument('--threshold', type=float, default=90, help="similarity percent threshold")
+    command.add_argument('--max-age', type=int, default=30)
+
+    command = add_command('chart', "a pizza or radar chart", position='required', player='required', output=False)
+    command.add_argument('chart', choices=['pizza', 'radar'])
+    command.add_argument('--output', required=True, help="a .png or .svg file")
+
+    args = parser.parse_args(argv)
+    if args.command == 'weighted-rank' and args.player and (args.league == 'All' or not args.position):
+        parser.error("--player needs --league and --position")
+
+    try:
+        result = run_command(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if result is not None:
+        write_table(result, args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
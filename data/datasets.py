@@ -0,0 +1,107 @@
+"""
+One copy of each provider's player-season dataset per process, shared by every page
+and session.
+
+get_dataset returns the same frame object to every caller rather than a copy, so
+memory doesn't grow with the number of sessions. The frame is shared and must be
+treated as read-only: derive new frames from it (filtering, take, copy) and never
+assign into it. Each frame carries its version token in attrs['data_version']; the
+token of the data as it is on disk is checked on every call, and the frame is
+reloaded once, under a lock, when it changed.
+"""
+import threading
+from datetime import datetime
+import numpy as np
+from data.retrieve_statbomb_data import get_statsbomb_player_season_stats, statsbomb_snapshot_max_age
+from data.retrieve_wyscout_data import data_path, get_source_manifest, get_wyscout_player_season_stats, patch_wyscout_dataset
+from data.snapshot import get_data_version, read_snapshot_metadata, write_snapshot
+from utilities.query import set_data_version
+
+dataset_loaders = {
+    'statsbomb': get_statsbomb_player_season_stats,
+    'wyscout': get_wyscout_player_season_stats,
+}
+
+_datasets = {}
+_dataset_locks = {provider: threading.Lock() for provider in dataset_loaders}
+
+
+def get_dataset_version(provider):
+    """
+    Version token of the provider's data as it is now, or None when the data has to be
+    built first (no snapshot yet, or a StatsBomb snapshot older than its refresh age).
+    """
+    if provider == 'wyscout':
+        return get_data_version(get_source_manifest())
+    metadata = read_snapshot_metadata(provider)
+    if metadata is None:
+        return None
+    age = datetime.now() - datetime.fromisoformat(metadata['created_at'])
+    if age.total_seconds() > statsbomb_snapshot_max_age:
+        return None
+    return get_data_version(metadata['sources'])
+
+
+def get_dataset(provider):
+    """
+    Returns the shared, read-only player-season frame of provider ('statsbomb' or
+    'wyscout'), loading it when it isn't loaded yet or its version token is out of date.
+    Every page and session gets this one frame, so reruns and button presses never
+    fetch or parse anything again, and Wyscout files added on the Upload Data page are
+    in it once applied by apply_wyscout_upload.
+    """
+    if provider not in dataset_loaders:
+        raise ValueError(f"Unknown provider '{provider}', expected statsbomb or wyscout")
+    version = get_dataset_version(provider)
+    # Sessions asking at the same time wait for one load rather than each loading
+    with _dataset_locks[provider]:
+        df = _datasets.get(provider)
+        if df is None or version is None or df.attrs.get('data_version') != version:
+            df = dataset_loaders[provider]()
+            _datasets[provider] = df
+        return df
+
+
+def apply_wyscout_upload(partitions, folder_path=data_path):
+    """
+    Patches uploaded league-seasons ({(League, Season): DataFrame}) into the shared
+    Wyscout frame, writes its snapshot and publishes it, so every session sees the new
+    version without reading it back from disk. Runs under the provider lock, so it
+    never overlaps a reload or another upload. When the frame isn't loaded nothing is
+    patched: the next get_dataset rebuilds it from the files.
+    """
+    with _dataset_locks['wyscout']:
+        df = _datasets.get('wyscout')
+        if not partitions or df is None:
+            return None
+        df = patch_wyscout_dataset(df, partitions)
+        source_manifest = get_source_manifest(folder_path)
+        set_data_version(df, get_data_version(source_manifest))
+        write_snapshot(df, 'wyscout', source_manifest)
+        _datasets['wyscout'] = df
+        return df
+
+
+def dataset_view(df, league=None, season=None):
+    """
+    The rows of a shared frame for a league and season, where None, '' and 'All' match
+    every value. A league-season is stored as one contiguous block of rows, so it is
+    returned as a slice of df that shares its memory rather than a copy. This is how a
+    page selects from the shared frame (through analytics.api.load_players), and the
+    view is as read-only as the frame.
+    """
+    if league in [None, '', 'All'] and season in [None, '', 'All']:
+        return df
+    mask = np.ones(len(df), dtype=bool)
+    if league not in [None, '', 'All']:
+        mask &= (df['League'] == league).to_numpy()
+    if season not in [None, '', 'All']:
+        mask &= (df['Season'] == season).to_numpy()
+    rows = np.flatnonzero(mask)
+    if len(rows) > 0 and rows[-1] - rows[0] + 1 == len(rows):
+        view = df.iloc[rows[0]:rows[-1] + 1]
+    else:
+        view = df.iloc[rows]
+    # A part of the data is versioned apart from the whole, as read_partitions does
+    set_data_version(view, get_data_version([df.attrs.get('data_version'), league, season, None, None]))
+    return view
@@ -0,0 +1,65 @@
+"""
+Builds the player-season snapshots ahead of time, outside Streamlit.
+
+Usage:
+    python -m data.ingest statsbomb --workers 8
+    python -m data.ingest wyscout
+    python -m data.ingest all --full
+
+StatsBomb credentials are read from --user/--passwd or the SB_USERNAME and
+SB_PASSWORD environment variables, never from st.secrets. --api-mode record saves
+the API responses as fixtures and --api-mode replay rebuilds the snapshot from
+them offline (see data/statsbomb_replay.py).
+"""
+import argparse
+import os
+import sys
+import time
+from data.retrieve_statbomb_data import load_statsbomb_player_season_stats, max_concurrent_requests, use_statsbomb_api
+from data.statsbomb_replay import get_statsbomb_api, fixtures_dir
+from data.retrieve_wyscout_data import get_wyscout_player_season_stats, data_path
+from data.snapshot import snapshot_path
+
+
+def ingest_statsbomb(user, passwd, max_workers=max_concurrent_requests, full_refresh=False, api_mode='live'):
+    if api_mode != 'replay' and (not user or not passwd):
+        raise ValueError("StatsBomb credentials missing, pass --user/--passwd or set SB_USERNAME/SB_PASSWORD")
+    creds = {"user": user, "passwd": passwd}
+    df = load_statsbomb_player_season_stats(creds, max_workers=max_workers, full_refresh=full_refresh)
+    for failed in df.attrs.get('failed_competitions', []):
+        print(f"Failed: {failed['competition_name']} {failed['season_name']} ({failed['error']})")
+    return df
+
+
+def ingest_wyscout(folder_path=data_path):
+    return get_wyscout_player_season_stats(folder_path, use_snapshot=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the player-season snapshots used by the app.")
+    parser.add_argument('provider', choices=['statsbomb', 'wyscout', 'all'])
+    parser.add_argument('--user', default=os.environ.get('SB_USERNAME'))
+    parser.add_argument('--passwd', default=os.environ.get('SB_PASSWORD'))
+    parser.add_argument('--workers', type=int, default=max_concurrent_requests)
+    parser.add_argument('--full', action='store_true', help="re-fetch every StatsBomb competition-season")
+    parser.add_argument('--wyscout-folder', default=data_path)
+    parser.add_argument('--api-mode', choices=['live', 'record', 'replay'],
+                        default=os.environ.get('STATSBOMB_API_MODE', 'live'))
+    parser.add_argument('--fixtures', default=os.environ.get('STATSBOMB_FIXTURES_DIR', fixtures_dir))
+    args = parser.parse_args(argv)
+
+    use_statsbomb_api(get_statsbomb_api(args.api_mode, args.fixtures))
+
+    providers = ['statsbomb', 'wyscout'] if args.provider == 'all' else [args.provider]
+    for provider in providers:
+        start = time.time()
+        if provider == 'statsbomb':
+            df = ingest_statsbomb(args.user, args.passwd, args.workers, args.full, args.api_mode)
+        else:
+            df = ingest_wyscout(args.wyscout_folder)
+        print(f"{provider}: {len(df)} rows -> {snapshot_path(provider)} in {time.time() - start:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
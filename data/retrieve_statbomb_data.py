@@ -1,8 +1,23 @@
 import pandas as pd
 from datetime import datetime
 import numpy as np
-from statsbombpy import sb
-import streamlit as st
+import threading
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from data.schema import apply_player_season_schema, compute_age
+from data.snapshot import get_data_version, read_catalog, read_snapshot, read_snapshot_metadata, write_snapshot
+from data.statsbomb_replay import get_statsbomb_api
+from utilities.query import set_data_version
+
+# statsbombpy's sb module, or a record/replay stand-in chosen by STATSBOMB_API_MODE
+sb = get_statsbomb_api()
+
+
+def use_statsbomb_api(api):
+    global sb
+    sb = api
 
 # --- Metrics Needed ---
 statbomb_metrics_needed = [
@@ -120,54 +135,325 @@ position_mapping = {
 }
 
 
-# --- Main Statsbomb Load Function ---
-@st.cache_data(ttl=14400, show_spinner=False)
-def get_statsbomb_player_season_stats():
-    user = st.secrets["user"]
-    passwd = st.secrets["passwd"]
-    creds = {"user": user, "passwd": passwd}
-    all_comps = sb.competitions(creds=creds)
-    dataframes = []
+# --- Concurrent Fetch Settings ---
+max_concurrent_requests = 8     # worker pool size for player_season_stats calls
+request_timeout_secs = 90       # per-call timeout, a slow call is abandoned after this
+request_retries = 2             # extra attempts after the first failure
+retry_backoff_secs = 2          # doubled after each failed attempt
 
-    def calculate_age(birth_date):
-        today = datetime.today()
-        return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
 
-    for _, row in all_comps.iterrows():
-        try:
-            comp_id, season_id = row["competition_id"], row["season_id"]
-            df = sb.player_season_stats(comp_id, season_id, creds=creds)
+def transform_player_season_stats(df):
+    """
+    Normalizes the raw player_season_stats frame of one competition-season into the
+    renamed, position-mapped layout used by the visualizations.
+    """
+    df['birth_date'] = pd.to_datetime(df['birth_date'])
+    df['Age'] = compute_age(df['birth_date'])
 
-            df['birth_date'] = pd.to_datetime(df['birth_date'])
-            df['Age'] = df['birth_date'].apply(calculate_age)
+    available_cols = [col for col in statbomb_metrics_needed if col in df.columns]
+    df = df[available_cols]
 
-            available_cols = [col for col in statbomb_metrics_needed if col in df.columns]
-            df = df[available_cols]
+    df = df.replace([np.nan, 'NaN', 'None', '', 'nan', 'null'], 0)
+    df = df.apply(pd.to_numeric, errors='ignore')
 
-            df = df.replace([np.nan, 'NaN', 'None', '', 'nan', 'null'], 0)
-            df = df.apply(pd.to_numeric, errors='ignore')
+    df.rename(columns={k: v for k, v in metrics_mapping.items() if k in df.columns}, inplace=True)
 
-            df.rename(columns={k: v for k, v in metrics_mapping.items() if k in df.columns}, inplace=True)
+    df['Position'] = df['Position'].map(position_mapping)
+    df = df.dropna(subset=['Position'])
+    df['Position'] = df['Position'].astype(str).str.strip()
+    df = df[df['Minutes'] >= 490]
+    df['Minutes'] = df['Minutes'].astype(int)
+    return df
 
-            df['Position'] = df['Position'].map(position_mapping)
-            df = df.dropna(subset=['Position'])
-            df['Position'] = df['Position'].astype(str).str.strip()
-            df = df[df['Minutes'] >= 490]
-            df['Minutes'] = df['Minutes'].astype(int)
 
-            dataframes.append(df)
+def call_with_timeout(func, timeout, *args, slots=None, **kwargs):
+    """
+    Runs func in a daemon thread and raises TimeoutError if it hasn't returned after
+    timeout seconds. statsbombpy calls requests without a timeout and exposes no
+    session to set one on, so a hung call is abandoned rather than cancelled.
 
+    With slots, a threading.Semaphore, the call holds a slot until func has really
+    returned, abandoned or not, so no more calls run at once than there are slots. A
+    call waits up to timeout for a free slot, then raises TimeoutError.
+    """
+    result = {}
+    if slots is not None and not slots.acquire(timeout=timeout):
+        raise TimeoutError(f"no request slot free after {timeout}s, earlier calls are still running")
+
+    def target():
+        try:
+            result['value'] = func(*args, **kwargs)
         except Exception as e:
-            print(f"Error: {e}")
+            result['error'] = e
+        finally:
+            if slots is not None:
+                slots.release()
+
+    worker = threading.Thread(target=target, daemon=True)
+    worker.start()
+    worker.join(timeout)
+    if worker.is_alive():
+        raise TimeoutError(f"call timed out after {timeout}s")
+    if 'error' in result:
+        raise result['error']
+    return result['value']
+
+
+def fetch_player_season_stats(comp_id, season_id, creds, timeout=request_timeout_secs,
+                              retries=request_retries, backoff=retry_backoff_secs, slots=None):
+    """
+    Fetches and normalizes one competition-season, retrying with exponential backoff.
+    slots bounds the calls running at once, see call_with_timeout.
+    """
+    for attempt in range(retries + 1):
+        try:
+            df = call_with_timeout(sb.player_season_stats, timeout, comp_id, season_id, slots=slots, creds=creds)
+            break
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+    return transform_player_season_stats(df)
+
+
+def fetch_all_player_season_stats(all_comps, creds, max_workers=max_concurrent_requests,
+                                  timeout=request_timeout_secs, retries=request_retries,
+                                  backoff=retry_backoff_secs, on_result=None):
+    """
+    Fetches every competition-season in all_comps on a bounded thread pool.
+    on_result(row, df) is called from the calling thread as soon as each
+    competition-season has been fetched. Calls abandoned after timeout count against
+    max_workers until they return, so retries never run more than max_workers
+    requests at once.
+
+    Returns:
+        tuple: (list of normalized DataFrames in all_comps order,
+                list of dicts describing the competition-seasons that failed)
+    """
+    results = {}
+    failed = []
+    slots = threading.BoundedSemaphore(max(1, max_workers))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {}
+        for position, (_, row) in enumerate(all_comps.iterrows()):
+            future = executor.submit(
+                fetch_player_season_stats, row["competition_id"], row["season_id"], creds,
+                timeout, retries, backoff, slots
+            )
+            futures[future] = (position, row)
+
+        for future in as_completed(futures):
+            position, row = futures[future]
+            try:
+                results[position] = future.result()
+                if on_result is not None:
+                    on_result(row, results[position])
+            except Exception as e:
+                print(f"Error: {row.get('competition_name')} {row.get('season_name')}: {e}")
+                failed.append({
+                    'competition_id': row["competition_id"],
+                    'season_id': row["season_id"],
+                    'competition_name': row.get('competition_name'),
+                    'season_name': row.get('season_name'),
+                    'error': str(e),
+                })
+
+    dataframes = [results[position] for position in sorted(results)]
+    return dataframes, failed
+
+
+# --- Incremental Refresh ---
+statsbomb_cache_dir = './data/statsbomb_cache/'
+manifest_filename = 'manifest.json'
+update_fields = ['match_updated', 'match_available', 'match_updated_360', 'match_available_360']
+
+# Last combined frame built in this process, patched in place by the next refresh
+_combined_cache = {'frame': None}
+
+
+def season_key(comp_id, season_id):
+    return f"{comp_id}_{season_id}"
+
+
+def partition_path(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.pkl")
+
+
+def load_manifest(cache_dir=statsbomb_cache_dir):
+    path = os.path.join(cache_dir, manifest_filename)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
 
-    combined_df = pd.concat(dataframes, ignore_index=True)
+def save_manifest(manifest, cache_dir=statsbomb_cache_dir):
+    # Write to a temporary file first so an interrupted refresh never leaves a torn manifest
+    path = os.path.join(cache_dir, manifest_filename)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def get_update_stamp(row):
+    return {field: str(row[field]) for field in update_fields if field in row.index}
+
+
+def get_changed_competitions(all_comps, manifest, cache_dir=statsbomb_cache_dir):
+    """
+    Returns the rows of all_comps that are new, whose update timestamps differ from
+    the manifest, or whose cached partition is missing.
+    """
+    changed = []
+    for index, row in all_comps.iterrows():
+        key = season_key(row["competition_id"], row["season_id"])
+        entry = manifest.get(key)
+        if (entry is None or entry.get('stamp') != get_update_stamp(row)
+                or not os.path.exists(partition_path(cache_dir, key))):
+            changed.append(index)
+    return all_comps.loc[changed]
+
+
+def patch_combined_frame(combined_df, partitions, removed):
+    """
+    Replaces the rows of each (League, Season) in partitions and removed with the
+    freshly fetched frames.
+    """
+    stale = list(partitions.keys()) + list(removed)
+    if stale:
+        stale_index = pd.MultiIndex.from_tuples(stale)
+        keep = ~pd.MultiIndex.from_arrays([combined_df['League'], combined_df['Season']]).isin(stale_index)
+        combined_df = combined_df[keep]
+    return pd.concat([combined_df] + list(partitions.values()), ignore_index=True)
+
+
+def refresh_player_season_stats(creds, cache_dir=statsbomb_cache_dir, combined_df=None,
+                                full=False, max_workers=max_concurrent_requests):
+    """
+    Re-fetches only the competition-seasons whose update timestamps changed since the
+    last refresh. Every fetched partition is written to cache_dir and recorded in the
+    manifest as soon as it arrives, so an interrupted refresh resumes where it stopped.
+
+    Parameters:
+        creds (dict): StatsBomb API credentials.
+        cache_dir (str): Directory holding the manifest and the per-season partitions.
+        combined_df (pd.DataFrame): Previously built frame to patch, read from cache_dir if None.
+        full (bool): Ignore the manifest and re-fetch every competition-season.
+        max_workers (int): Worker pool size for the fetch.
+
+    Returns:
+        tuple: (combined DataFrame, list of refreshed keys, list of failed competition-seasons)
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    all_comps = sb.competitions(creds=creds)
+    manifest = {} if full else load_manifest(cache_dir)
+
+    current_keys = {season_key(row["competition_id"], row["season_id"]) for _, row in all_comps.iterrows()}
+    removed = [(entry['competition_name'], entry['season_name'])
+               for key, entry in manifest.items() if key not in current_keys]
+    manifest = {key: entry for key, entry in manifest.items() if key in current_keys}
+
+    changed_comps = get_changed_competitions(all_comps, manifest, cache_dir)
+    partitions = {}
+
+    def store_partition(row, df):
+        key = season_key(row["competition_id"], row["season_id"])
+        df.to_pickle(partition_path(cache_dir, key))
+        manifest[key] = {
+            'competition_name': row['competition_name'],
+            'season_name': row['season_name'],
+            'stamp': get_update_stamp(row),
+        }
+        save_manifest(manifest, cache_dir)
+        partitions[(row['competition_name'], row['season_name'])] = df
+
+    _, failed = fetch_all_player_season_stats(
+        changed_comps, creds, max_workers=max_workers, on_result=store_partition
+    )
+    save_manifest(manifest, cache_dir)
+
+    if combined_df is not None and not full:
+        combined_df = patch_combined_frame(combined_df, partitions, removed)
+    else:
+        dataframes = [pd.read_pickle(partition_path(cache_dir, key)) for key in manifest]
+        combined_df = pd.concat(dataframes, ignore_index=True)
+
+    return combined_df, list(partitions.keys()), failed
+
+
+# --- Main Statsbomb Load Function ---
+statsbomb_snapshot_max_age = 14400
+
+
+def load_statsbomb_player_season_stats(creds, max_workers=max_concurrent_requests, full_refresh=False):
+    """
+    Builds the combined player-season frame from the API without any Streamlit
+    dependency and writes it to the on-disk snapshot.
+    """
+    combined_df, _, failed = refresh_player_season_stats(
+        creds, combined_df=_combined_cache['frame'], full=full_refresh, max_workers=max_workers
+    )
+    _combined_cache['frame'] = combined_df
+    combined_df = combined_df.copy()
 
     # Ensure missing columns exist with default 0 to avoid 'not in index' errors
     for col in ['Pass Forward %', 'Scoring Contribution']:
         if col not in combined_df.columns:
             combined_df[col] = 0
 
+    combined_df = apply_player_season_schema(combined_df)
+    source_manifest = {
+        'competitions': load_manifest(),
+        'failed_competitions': failed,
+    }
+    combined_df.attrs['failed_competitions'] = failed
+    set_data_version(combined_df, get_data_version(source_manifest))
+    write_snapshot(combined_df, 'statsbomb', source_manifest)
     return combined_df
 
+
+def get_statsbomb_player_season_stats(max_workers=max_concurrent_requests, full_refresh=False):
+    """
+    Reads the snapshot, or rebuilds it from the API when it is missing or older than
+    statsbomb_snapshot_max_age. Pages get the loaded frame from data.datasets, which
+    keeps one copy per process.
+    """
+    if not full_refresh:
+        snapshot = read_snapshot('statsbomb', max_age_secs=statsbomb_snapshot_max_age)
+        if snapshot is not None:
+            return snapshot
+
+    return load_statsbomb_player_season_stats(get_statsbomb_credentials(), max_workers=max_workers, full_refresh=full_refresh)
+
+def get_statsbomb_credentials():
+    """
+    StatsBomb credentials from the SB_USERNAME and SB_PASSWORD environment variables,
+    falling back to the Streamlit secrets when running in the app.
+    """
+    user, passwd = os.environ.get('SB_USERNAME'), os.environ.get('SB_PASSWORD')
+    if not user or not passwd:
+        try:
+            import streamlit as st
+            user, passwd = st.secrets["user"], st.secrets["passwd"]
+        except (ImportError, KeyError, FileNotFoundError):
+            raise ValueError("StatsBomb credentials missing, set SB_USERNAME/SB_PASSWORD or add user/passwd to the Streamlit secrets")
+    return {"user": user, "passwd": passwd}
+
+def get_statsbomb_catalog():
+    """
+    Returns the catalog of the partitioned snapshot, refreshing the snapshot first when
+    it is missing or older than the cache TTL.
+    """
+    metadata = read_snapshot_metadata('statsbomb')
+    if metadata is not None:
+        age = datetime.now() - datetime.fromisoformat(metadata['created_at'])
+        if age.total_seconds() <= statsbomb_snapshot_max_age:
+            return read_catalog('statsbomb')
+    get_statsbomb_player_season_stats()
+    return read_catalog('statsbomb')
+
 def get_player_season_data():
     return get_statsbomb_player_season_stats()
@@ -1,9 +1,20 @@
 import pandas as pd
 import numpy as np
-import streamlit as st
 import os
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from data.schema import apply_player_season_schema
+from data.snapshot import get_data_version, prepare_for_parquet, read_catalog, read_snapshot, write_snapshot
+from utilities.query import set_data_version
 
 data_path = './data/wyscout_data/'
+wyscout_extensions = ('.xlsx', '.csv')
+# Columnar copy of every parsed export, keyed by content hash. The copies hold the
+# file's content only: League and Season come from the filename each time it is read
+parsed_cache_dir = './data/wyscout_cache/'
+# Bump whenever read_transform_individual_files changes so cached parses are redone
+parsed_cache_version = 2
 position_mapping = {
     "RWB": "Full Back",
     "RB": "Full Back",
@@ -224,34 +235,206 @@ desired_columns = [
 # Create the mapping
 df_mapping = dict(zip(original_columns, desired_columns))
 
-def get_wyscout_player_season_stats(folder_path=data_path):
-    all_data = []
+def get_source_manifest(folder_path=data_path):
+    """
+    Describes the export files a snapshot is built from, so it can be rebuilt when any
+    of them is added, removed or replaced.
+    """
+    manifest = {}
+    for filename in sorted(os.listdir(folder_path)):
+        if filename.endswith(wyscout_extensions):
+            stat = os.stat(os.path.join(folder_path, filename))
+            manifest[filename] = {'size': stat.st_size, 'mtime': stat.st_mtime}
+    return manifest
+
+def get_wyscout_player_season_stats(folder_path=data_path, use_snapshot=True):
+    source_manifest = get_source_manifest(folder_path)
+    if use_snapshot:
+        snapshot = read_snapshot('wyscout', expected_sources=source_manifest)
+        if snapshot is not None:
+            return snapshot
+
+    combined_df = parse_wyscout_folder(folder_path)
+    set_data_version(combined_df, get_data_version(source_manifest))
+    write_snapshot(combined_df, 'wyscout', source_manifest)
+    return combined_df
+
+def get_wyscout_catalog(folder_path=data_path):
+    """
+    Returns the catalog of the partitioned snapshot, rebuilding the snapshot first when
+    the export folder changed since it was written.
+    """
+    catalog = read_catalog('wyscout')
+    if catalog is None or catalog['sources'] != get_source_manifest(folder_path):
+        get_wyscout_player_season_stats(folder_path)
+        catalog = read_catalog('wyscout')
+    return catalog
+
+def get_league_season(filename):
+    # Extract league and season from the filename, e.g. "Ligue 1_23 24.xlsx"
+    parts = os.path.basename(filename).split('_')
+    season = ''
+    if len(parts)>1:
+        season = transform_season(parts[1].split('.')[0])
+    return parts[0], season
+
+def tag_league_season(df, filename):
+    """
+    Sets League and Season on the parsed rows of an export from its current filename.
+    """
+    df['League'], df['Season'] = get_league_season(filename)
+    return df
+
+def parse_wyscout_file(file_path):
+    """
+    Parses one league-season export, tagging the rows with the League and Season
+    encoded in its filename.
+    """
+    return tag_league_season(read_transform_individual_files(file_path), file_path)
+
+def file_content_hash(file_path):
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def parsed_cache_path(content_hash, cache_dir=parsed_cache_dir):
+    return os.path.join(cache_dir, f"{content_hash}_v{parsed_cache_version}.parquet")
+
+def load_parsed_cache_index(cache_dir=parsed_cache_dir):
+    path = os.path.join(cache_dir, 'index.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_parsed_cache_index(index, cache_dir=parsed_cache_dir):
+    path = os.path.join(cache_dir, 'index.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def parse_wyscout_folder(folder_path=data_path, cache_dir=parsed_cache_dir, max_workers=None):
+    """
+    Parses every export in folder_path, reusing the columnar sidecar of any file
+    whose content was parsed before and sending the rest to a process pool.
+
+    A file is looked up by mtime and size first and only hashed when those changed,
+    so an untouched folder costs one stat per file.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    index = load_parsed_cache_index(cache_dir)
+    filenames = sorted(f for f in os.listdir(folder_path) if f.endswith(wyscout_extensions))
+
+    content_hashes = {}
+    to_parse = []
+    for filename in filenames:
+        file_path = os.path.join(folder_path, filename)
+        stat = os.stat(file_path)
+        entry = index.get(filename)
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            content_hash = entry['hash']
+        else:
+            content_hash = file_content_hash(file_path)
+            index[filename] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'hash': content_hash}
+        content_hashes[filename] = content_hash
+        if not os.path.exists(parsed_cache_path(content_hash, cache_dir)):
+            to_parse.append(filename)
 
-    # Iterate through all files in the folder
-    for filename in os.listdir(folder_path):
-        if filename.endswith('.xlsx'):  # Check if it's an .xlsx file
-            # Extract league and season from the filename
-            parts = filename.split('_')
-            # Read the file into a DataFrame
-            file_path = os.path.join(folder_path, filename)
-            df = read_transform_individual_files(file_path)
-            
-            df['League'] = parts[0]
-
-            season = ''
-            if len(parts)>1:
-                season = parts[1].split('.')[0]
-                df['Season'] = transform_season(season)
-            else:
-                df['Season'] = season
-            all_data.append(df)
+    # Files with the same content under several names are parsed once
+    to_parse = list({content_hashes[filename]: filename for filename in to_parse}.values())
+    parsed = {}
+    if len(to_parse) == 1:
+        parsed[to_parse[0]] = read_transform_individual_files(os.path.join(folder_path, to_parse[0]))
+    elif to_parse:
+        workers = min(max_workers or os.cpu_count() or 1, len(to_parse))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            file_paths = [os.path.join(folder_path, filename) for filename in to_parse]
+            for filename, df in zip(to_parse, executor.map(read_transform_individual_files, file_paths)):
+                parsed[filename] = df
+
+    for filename, df in parsed.items():
+        df = prepare_for_parquet(df)
+        df.to_parquet(parsed_cache_path(content_hashes[filename], cache_dir), compression='zstd', index=False)
+        parsed[filename] = df
+
+    index = {filename: entry for filename, entry in index.items() if filename in content_hashes}
+    save_parsed_cache_index(index, cache_dir)
+
+    all_data = []
+    for filename in filenames:
+        if filename in parsed:
+            df = parsed[filename].copy()
+        else:
+            df = pd.read_parquet(parsed_cache_path(content_hashes[filename], cache_dir))
+        all_data.append(tag_league_season(df, filename))
 
     # Concatenate all DataFrames
     combined_df = pd.concat(all_data, ignore_index=True)
-    return combined_df
+    return apply_player_season_schema(combined_df)
+
+def store_wyscout_upload(filename, content, folder_path=data_path, cache_dir=parsed_cache_dir):
+    """
+    Adds or replaces one league-season export without touching the other files.
+
+    The raw upload is written as-is, any other file for the same league-season is
+    removed, and the parsed content goes straight into the columnar cache so the
+    loader never parses it again.
+
+    Returns:
+        tuple: ((League, Season) partition replaced, parsed DataFrame)
+    """
+    if not filename.endswith(wyscout_extensions):
+        raise ValueError(f"{filename} is not a .xlsx or .csv export")
+    partition = get_league_season(filename)
+    os.makedirs(folder_path, exist_ok=True)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Parse from the cache folder first so a bad upload never replaces a good file
+    file_path = os.path.join(folder_path, filename)
+    tmp_path = os.path.join(cache_dir, f"upload_{filename}")
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    try:
+        df = prepare_for_parquet(read_transform_individual_files(tmp_path))
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+    for existing in os.listdir(folder_path):
+        if (existing != filename and existing.endswith(wyscout_extensions)
+                and get_league_season(existing) == partition):
+            os.remove(os.path.join(folder_path, existing))
+    os.replace(tmp_path, file_path)
+
+    # Cached as content only, like the loader's copies, then tagged with this upload's name
+    content_hash = hashlib.sha1(content).hexdigest()
+    df.to_parquet(parsed_cache_path(content_hash, cache_dir), compression='zstd', index=False)
+    df = tag_league_season(df, filename)
+
+    stat = os.stat(file_path)
+    index = load_parsed_cache_index(cache_dir)
+    index[filename] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'hash': content_hash}
+    save_parsed_cache_index(index, cache_dir)
+    return partition, df
+
+def patch_wyscout_dataset(combined_df, partitions):
+    """
+    Replaces the rows of every (League, Season) in partitions with the new frames.
+    """
+    keys = pd.MultiIndex.from_tuples(list(partitions.keys()))
+    keep = ~pd.MultiIndex.from_arrays([
+        combined_df['League'].astype(str), combined_df['Season'].astype(str)
+    ]).isin(keys)
+    combined_df = pd.concat([combined_df[keep]] + list(partitions.values()), ignore_index=True)
+    return apply_player_season_schema(combined_df)
 
 def read_transform_individual_files(file_path):
-    data = pd.read_excel(file_path)
+    if file_path.endswith('.csv'):
+        data = pd.read_csv(file_path)
+    else:
+        data = pd.read_excel(file_path)
     data["Position"] = data["Position"].str.split(", ").str[0]
     data['Position'] = data['Position'].map(position_mapping)
     data = data.dropna(subset=['Position'])
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+# --- Unified Player-Season Schema ---
+# Applied to the combined frame of either provider once all sources are concatenated,
+# since concatenating categoricals with different categories falls back to object.
+label_columns = ['League', 'Season', 'Position', 'Team']
+string_columns = ['Player Name']
+small_int_columns = {
+    'Age': 'int8',
+    'Minutes': 'int16',
+}
+metric_dtype = 'float32'
+
+
+def compute_age(birth_dates, today=None):
+    """
+    Vectorized age in whole years, 0 where the birth date is missing or unparseable.
+    """
+    today = pd.Timestamp.today() if today is None else pd.Timestamp(today)
+    birth_dates = pd.to_datetime(birth_dates, errors='coerce')
+    not_had_birthday = (birth_dates.dt.month > today.month) | (
+        (birth_dates.dt.month == today.month) & (birth_dates.dt.day > today.day)
+    )
+    age = today.year - birth_dates.dt.year - not_had_birthday.astype(int)
+    return age.fillna(0).astype(int)
+
+
+def apply_player_season_schema(df):
+    """
+    Casts the combined player-season frame to the compact schema: categoricals for the
+    label columns, small ints for Age and Minutes and float32 for every other numeric
+    metric. Low-cardinality descriptive text columns become categoricals as well.
+    """
+    df = df.copy()
+
+    for col in label_columns:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip().astype('category')
+
+    for col in string_columns:
+        if col in df.columns:
+            df[col] = df[col].astype(str)
+
+    for col, dtype in small_int_columns.items():
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors='coerce').replace([np.inf, -np.inf], np.nan).fillna(0)
+            info = np.iinfo(dtype)
+            df[col] = values.clip(info.min, info.max).astype(dtype)
+
+    skip = set(label_columns) | set(string_columns) | set(small_int_columns)
+    for col in df.columns:
+        if col in skip:
+            continue
+        if pd.api.types.is_bool_dtype(df[col]):
+            continue
+        if pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype(metric_dtype)
+        elif df[col].dtype == object and df[col].nunique() < len(df) / 2:
+            df[col] = df[col].astype(str).astype('category')
+
+    return df
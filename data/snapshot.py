@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote
+import pyarrow as pa
+import pyarrow.parquet as pq
+from data.schema import apply_player_season_schema
+from utilities.query import set_data_version
+
+# Layout: <snapshot_dir>/<provider>/catalog.json
+#         <snapshot_dir>/<provider>/<version>/league=<League>/season=<Season>/part.parquet
+# Every write adds a new version folder and then replaces catalog.json, the only file
+# that is ever overwritten
+snapshot_dir = './data/snapshots/'
+# Bump whenever the normalized column layout changes so stale snapshots are rebuilt
+snapshot_schema_version = 3
+catalog_filename = 'catalog.json'
+# Version folders the catalog no longer points to, and the staging folders of writers
+# that died, are removed once older than this, so a reader that loaded the previous
+# catalog can still read its partitions
+snapshot_retention_secs = 3600
+
+
+def get_data_version(source_manifest):
+    """
+    Short token identifying a dataset build, derived from the sources it was built from.
+    Caches of anything computed from the dataset are keyed by it.
+    """
+    payload = json.dumps(source_manifest, sort_keys=True, default=str).encode()
+    return hashlib.sha1(payload).hexdigest()[:12]
+
+
+def provider_path(provider, folder_path=snapshot_dir):
+    return os.path.join(folder_path, provider)
+
+
+def snapshot_path(provider, folder_path=snapshot_dir):
+    return os.path.join(provider_path(provider, folder_path), catalog_filename)
+
+
+def partition_relpath(league, season):
+    # Seasons look like "2023/2024", so both names are percent-encoded
+    return os.path.join(f"league={quote(str(league), safe=' ')}",
+                        f"season={quote(str(season), safe=' ')}", 'part.parquet')
+
+
+def prepare_for_parquet(df):
+    # Object columns can mix strings with the 0 used to fill missing values,
+    # which Arrow can't store in a single column
+    df = df.copy()
+    for col in df.select_dtypes(include='object').columns:
+        df[col] = df[col].astype(str)
+    return df
+
+
+def write_snapshot(df, provider, source_manifest, folder_path=snapshot_dir):
+    """
+    Writes the normalized player-season frame as one zstd compressed Parquet file per
+    league-season, plus a catalog holding the schema version, the manifest of the
+    sources it was built from and the row count and positions of every partition.
+
+    The partitions are staged in a private folder, which is then moved into place as a
+    new version folder, and catalog.json is replaced last in one atomic rename. Readers
+    see either the old or the new catalog, and the partitions of both stay on disk for
+    snapshot_retention_secs. Concurrent writers don't share any files; the last catalog
+    written wins.
+    """
+    target = provider_path(provider, folder_path)
+    os.makedirs(target, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=target)
+    version = f"v-{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+    try:
+        df = prepare_for_parquet(df)
+        partitions = []
+        for (league, season), part in df.groupby(['League', 'Season'], observed=True, sort=True):
+            relpath = partition_relpath(league, season)
+            path = os.path.join(staging, relpath)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            table = pa.Table.from_pandas(part.reset_index(drop=True), preserve_index=False)
+            pq.write_table(table, path, compression='zstd')
+            partitions.append({
+                'league': str(league),
+                'season': str(season),
+                'path': os.path.join(version, relpath),
+                'rows': len(part),
+                'positions': sorted(part['Position'].astype(str).unique().tolist()),
+            })
+        os.rename(staging, os.path.join(target, version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    catalog = {
+        'schema_version': snapshot_schema_version,
+        'provider': provider,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'rows': len(df),
+        'sources': source_manifest,
+        'partitions': partitions,
+    }
+    fd, catalog_tmp = tempfile.mkstemp(prefix='.catalog-', suffix='.json', dir=target)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(catalog, f, default=str)
+    os.replace(catalog_tmp, os.path.join(target, catalog_filename))
+
+    remove_stale_versions(provider, folder_path)
+    return target
+
+
+def remove_stale_versions(provider, folder_path=snapshot_dir, max_age_secs=snapshot_retention_secs):
+    """
+    Removes the version and staging folders of provider that the current catalog
+    doesn't use and that haven't changed for max_age_secs.
+    """
+    target = provider_path(provider, folder_path)
+    catalog = read_catalog(provider, folder_path)
+    in_use = set()
+    if catalog is not None:
+        in_use = {partition['path'].replace(os.sep, '/').split('/')[0] for partition in catalog['partitions']}
+    now = time.time()
+    for name in os.listdir(target):
+        path = os.path.join(target, name)
+        if name == catalog_filename or name in in_use:
+            continue
+        try:
+            if now - os.path.getmtime(path) < max_age_secs:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def read_catalog(provider, folder_path=snapshot_dir):
+    """
+    Returns the catalog of the provider's snapshot, or None when there is no snapshot
+    written with the current schema version.
+    """
+    path = snapshot_path(provider, folder_path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        catalog = json.load(f)
+    if catalog.get('schema_version') != snapshot_schema_version:
+        return None
+    return catalog
+
+
+def read_snapshot_metadata(provider, folder_path=snapshot_dir):
+    catalog = read_catalog(provider, folder_path)
+    if catalog is None:
+        return None
+    return {k: v for k, v in catalog.items() if k != 'partitions'}
+
+
+def select_partitions(catalog, league=None, season=None):
+    """
+    Returns the catalog entries matching league and season, where None, '' or 'All'
+    match every value.
+    """
+    return [
+        partition for partition in catalog['partitions']
+        if (league in [None, '', 'All'] or partition['league'] == league)
+        and (season in [None, '', 'All'] or partition['season'] == season)
+    ]
+
+
+def read_partition_table(provider, partition, columns=None, filters=None, folder_path=snapshot_dir):
+    path = os.path.join(provider_path(provider, folder_path), partition['path'])
+    return pq.read_table(path, columns=columns, filters=filters)
+
+
+def matching_partitions(catalog, league=None, season=None, positions=None):
+    return [
+        partition for partition in select_partitions(catalog, league, season)
+        if not positions or set(positions) & set(partition['positions'])
+    ]
+
+
+def read_partitions(provider, league=None, season=None, columns=None, positions=None,
+                    folder_path=snapshot_dir, catalog=None):
+    """
+    Reads only the partitions matching league, season and positions into one frame with
+    the unified schema, or returns None when there is no snapshot.
+    """
+    catalog = catalog or read_catalog(provider, folder_path)
+    if catalog is None:
+        return None
+    partitions = matching_partitions(catalog, league, season, positions)
+    if not partitions:
+        return None
+
+    # Arrow releases the GIL while decoding, so partitions are read on a thread pool
+    # and converted to pandas once rather than per partition
+    filters = [('Position', 'in', list(positions))] if positions else None
+    with ThreadPoolExecutor(max_workers=min(8, len(partitions))) as executor:
+        tables = list(executor.map(
+            lambda partition: read_partition_table(provider, partition, columns, filters, folder_path),
+            partitions
+        ))
+    table = pa.concat_tables(tables, promote_options='permissive')
+
+    df = apply_player_season_schema(table.to_pandas())
+    data_version = get_data_version(catalog['sources'])
+    if len(partitions) != len(catalog['partitions']) or positions or columns:
+        data_version = get_data_version([data_version, league, season, positions, columns])
+    set_data_version(df, data_version)
+    if 'failed_competitions' in catalog['sources']:
+        df.attrs['failed_competitions'] = catalog['sources']['failed_competitions']
+    return df
+
+
+def read_snapshot(provider, folder_path=snapshot_dir, max_age_secs=None, expected_sources=None):
+    """
+    Loads the whole snapshot for provider, or returns None when it is missing, was
+    written with another schema version, is older than max_age_secs, or was built from
+    sources other than expected_sources.
+    """
+    catalog = read_catalog(provider, folder_path)
+    if catalog is None:
+        return None
+
+    if max_age_secs is not None:
+        age = datetime.now() - datetime.fromisoformat(catalog['created_at'])
+        if age.total_seconds() > max_age_secs:
+            return None
+
+    if expected_sources is not None and catalog['sources'] != expected_sources:
+        return None
+
+    return read_partitions(provider, folder_path=folder_path, catalog=catalog)
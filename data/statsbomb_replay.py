@@ -0,0 +1,152 @@
+"""
+Record/replay stand-in for statsbombpy's sb module.
+
+The loader in data/retrieve_statbomb_data.py only calls sb.competitions and
+sb.player_season_stats, so any object exposing those two functions with the same
+signatures can take its place:
+
+    live    the real statsbombpy sb module
+    record  calls the real API and saves every response under fixtures_dir
+    replay  serves the saved responses, optionally with injected latency and failures
+
+The mode is picked from the STATSBOMB_API_MODE environment variable (default live),
+with STATSBOMB_FIXTURES_DIR, STATSBOMB_REPLAY_LATENCY and STATSBOMB_REPLAY_FAILURE_RATE
+tuning the fixtures location and the replay behaviour.
+"""
+import json
+import os
+import random
+import threading
+import time
+import pandas as pd
+from statsbombpy import sb
+from statsbombpy.config import DEFAULT_CREDS
+
+fixtures_dir = './data/statsbomb_fixtures/'
+
+
+def competitions_fixture_path(folder_path):
+    return os.path.join(folder_path, 'competitions.json')
+
+
+def player_season_stats_fixture_path(folder_path, competition_id, season_id):
+    return os.path.join(folder_path, 'player_season_stats', f"{competition_id}_{season_id}.json")
+
+
+def write_fixture(path, payload):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def read_fixture(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No recorded response at {path}")
+    with open(path) as f:
+        return json.load(f)
+
+
+def competitions_to_format(competitions, fmt):
+    if fmt == "dataframe":
+        return pd.DataFrame(competitions)
+    # Same keys statsbombpy uses for fmt="dict"
+    return {
+        (c["country_name"], c["competition_name"], c["season_name"], c["competition_gender"]): c
+        for c in competitions
+    }
+
+
+def player_season_stats_to_format(player_season_stats, fmt):
+    if fmt == "dataframe":
+        return pd.json_normalize(player_season_stats)
+    return player_season_stats
+
+
+class RecordingStatsBombAPI:
+    """
+    Forwards every call to the live API and saves the raw response as a fixture.
+    """
+
+    def __init__(self, folder_path=fixtures_dir):
+        self.folder_path = folder_path
+
+    def competitions(self, fmt="dataframe", creds: dict = DEFAULT_CREDS):
+        competitions = list(sb.competitions(fmt="dict", creds=creds).values())
+        write_fixture(competitions_fixture_path(self.folder_path), competitions)
+        return competitions_to_format(competitions, fmt)
+
+    def player_season_stats(self, competition_id, season_id, fmt="dataframe", creds: dict = DEFAULT_CREDS):
+        player_season_stats = sb.player_season_stats(competition_id, season_id, fmt="dict", creds=creds)
+        write_fixture(
+            player_season_stats_fixture_path(self.folder_path, competition_id, season_id),
+            player_season_stats
+        )
+        return player_season_stats_to_format(player_season_stats, fmt)
+
+
+class ReplayStatsBombAPI:
+    """
+    Serves recorded responses without network or credentials.
+
+    Parameters:
+        folder_path (str): Directory written by RecordingStatsBombAPI.
+        latency (float): Seconds to sleep before every player_season_stats response.
+        jitter (float): Extra random latency of up to this many seconds.
+        failure_rate (float): Probability that a player_season_stats call raises ConnectionError.
+        fail_keys (iterable): (competition_id, season_id) pairs that always fail.
+        seed (int): Seed for the latency and failure draws, for repeatable runs.
+    """
+
+    def __init__(self, folder_path=fixtures_dir, latency=0.0, jitter=0.0, failure_rate=0.0,
+                 fail_keys=(), seed=None):
+        self.folder_path = folder_path
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.fail_keys = {(int(c), int(s)) for c, s in fail_keys}
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def competitions(self, fmt="dataframe", creds: dict = DEFAULT_CREDS):
+        competitions = read_fixture(competitions_fixture_path(self.folder_path))
+        return competitions_to_format(competitions, fmt)
+
+    def player_season_stats(self, competition_id, season_id, fmt="dataframe", creds: dict = DEFAULT_CREDS):
+        # The loader calls this from a thread pool, so keep the shared RNG consistent
+        with self.lock:
+            self.calls.append((competition_id, season_id))
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            fail = self.random.random() < self.failure_rate
+
+        time.sleep(delay)
+        if fail or (int(competition_id), int(season_id)) in self.fail_keys:
+            raise ConnectionError(f"Injected failure for competition {competition_id} season {season_id}")
+
+        player_season_stats = read_fixture(
+            player_season_stats_fixture_path(self.folder_path, competition_id, season_id)
+        )
+        return player_season_stats_to_format(player_season_stats, fmt)
+
+
+def get_statsbomb_api(mode=None, folder_path=None):
+    """
+    Returns the sb module or a record/replay stand-in for it, following
+    STATSBOMB_API_MODE unless mode is given.
+    """
+    mode = mode or os.environ.get('STATSBOMB_API_MODE', 'live')
+    folder_path = folder_path or os.environ.get('STATSBOMB_FIXTURES_DIR', fixtures_dir)
+
+    if mode == 'live':
+        return sb
+    if mode == 'record':
+        return RecordingStatsBombAPI(folder_path)
+    if mode == 'replay':
+        return ReplayStatsBombAPI(
+            folder_path,
+            latency=float(os.environ.get('STATSBOMB_REPLAY_LATENCY', 0)),
+            failure_rate=float(os.environ.get('STATSBOMB_REPLAY_FAILURE_RATE', 0)),
+        )
+    raise ValueError(f"Unknown StatsBomb API mode '{mode}', expected live, record or replay")
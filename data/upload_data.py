@@ -1,8 +1,8 @@
 import streamlit as st
-import pandas as pd
-import os
-import shutil
-from data.retrieve_wyscout_data import get_wyscout_player_season_stats
+import threading
+import time
+from data.datasets import apply_wyscout_upload
+from data.retrieve_wyscout_data import store_wyscout_upload
 
 st.set_page_config(
     page_title='Bristol Rovers - Data Analysis Tool',
@@ -14,11 +14,29 @@ st.set_page_config(
 # Directory to save updated files
 data_dir = "data/wyscout_data"
 
-# Function to clear existing files in the data directory
-def clear_data_folder():
-    if os.path.exists(data_dir):
-        shutil.rmtree(data_dir)
-    os.makedirs(data_dir)
+# Parses and stores each upload in a background thread, reporting progress through job
+def run_upload_job(job, files):
+    for file_name, content in files:
+        job['current'] = file_name
+        try:
+            partition, df = store_wyscout_upload(file_name, content, data_dir)
+            job['partitions'][partition] = df
+            job['saved'].append(file_name)
+        except Exception as e:
+            job['errors'].append(f"Error reading {file_name}: {e}")
+        job['done'] += 1
+    job['finished'] = True
+
+def start_upload_job(uploaded_files):
+    files = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+    job = {'total': len(files), 'done': 0, 'current': None, 'saved': [], 'errors': [],
+           'partitions': {}, 'finished': False}
+    threading.Thread(target=run_upload_job, args=(job, files), daemon=True).start()
+    st.session_state.upload_job = job
+
+def apply_upload_job(job):
+    # Patch only the uploaded league-seasons into the shared dataset, as a new frame
+    apply_wyscout_upload(job['partitions'], data_dir)
 
 # Streamlit layout and functionality
 st.title("Update Wyscout Player's Data")
@@ -35,36 +53,31 @@ if password:
 if st.session_state.submitted:
 
     if password == st.secrets["PASSWORD"]:
-        st.write("Please upload CSV or Excel files containing all the required metrics.")
-        
+        st.write("Please upload CSV or Excel files containing all the required metrics. "
+                 "Each file replaces only the league and season in its name, e.g. 'Ligue 1_24 25.xlsx'.")
+
         # File uploader for multiple files
         uploaded_files = st.file_uploader("Choose CSV or Excel files", type=["csv", "xlsx"], accept_multiple_files=True)
 
-        if uploaded_files:
-            valid_files = []
-            for uploaded_file in uploaded_files:
-                try:
-                    # Check file type and read accordingly
-                    if uploaded_file.name.endswith('.csv'):
-                        df = pd.read_csv(uploaded_file)
-                    elif uploaded_file.name.endswith('.xlsx'):
-                        df = pd.read_excel(uploaded_file)
-
-                    valid_files.append((uploaded_file.name, df))
+        job = st.session_state.get('upload_job')
+        if job is not None and not job['finished']:
+            st.progress(job['done'] / job['total'], text=f"Processing {job['current'] or ''} ({job['done']}/{job['total']})")
+            time.sleep(0.5)
+            st.experimental_rerun()
 
-                except Exception as e:
-                    st.error(f"Error reading {uploaded_file.name}: {e}")
+        if job is not None and job['finished']:
+            apply_upload_job(job)
+            for file_name in job['saved']:
+                st.success(f"File {file_name} have been saved successfully.")
+            for error in job['errors']:
+                st.error(error)
+            del st.session_state['upload_job']
 
-            # Update data if files are valid
-            if valid_files:
-                if st.button("Update Data")  :
-                    clear_data_folder()
-                    for file_name, df in valid_files:
-                        save_path = os.path.join(data_dir, f"{os.path.splitext(file_name)[0]}.xlsx")
-                        df.to_excel(save_path, index=False, engine='openpyxl')
-                        st.success(f"File {file_name} have been saved successfully.")
-                    wyscout_data = get_wyscout_player_season_stats()
-                    st.session_state.wyscout_data = wyscout_data
+        # Update data if files are valid
+        if uploaded_files and job is None:
+            if st.button("Update Data"):
+                start_upload_job(uploaded_files)
+                st.experimental_rerun()
 
     else:
         st.sidebar.error("Invalid Password")
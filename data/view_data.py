@@ -1,7 +1,9 @@
 import streamlit as st
 from st_pages import show_pages_from_config
-from data.retrieve_statbomb_data import get_statsbomb_player_season_stats
-from data.retrieve_wyscout_data import get_wyscout_player_season_stats
+from data.retrieve_statbomb_data import get_statsbomb_catalog
+from data.retrieve_wyscout_data import get_wyscout_catalog
+from analytics.api import load_players
+from data.snapshot import select_partitions
 
 show_pages_from_config()
 st.set_page_config(
@@ -61,17 +63,20 @@ st.markdown("""
 
 
 st.markdown("")
-data = []
 api_name = st.selectbox("Select Data API", options=["Statbomb", "Wyscout"])
 if api_name=='Statbomb':
+    provider = 'statsbomb'
     with st.spinner("Retrieving data from statsbomb api"):
-        data = get_statsbomb_player_season_stats()
-        data["Minutes"] = data['Minutes'].astype(int)
+        catalog = get_statsbomb_catalog()
 elif api_name=='Wyscout':
+    provider = 'wyscout'
     with st.spinner("Retrieving data from wyscout api"):
-        if 'wyscout_data' not in st.session_state:
-            wyscout_data = get_wyscout_player_season_stats()
-            st.session_state.wyscout_data = wyscout_data
-        else:
-            data =  st.session_state.wysc
-st.dataframe(data, height=600, use_container_width=True,)
\ No newline at end of file
+        catalog = get_wyscout_catalog()
+
+leagues = ['All'] + sorted({partition['league'] for partition in catalog['partitions']})
+league = st.selectbox("Select League", options=leagues)
+seasons = ['All'] + sorted({partition['season'] for partition in select_partitions(catalog, league)})
+season = st.selectbox("Select Season", options=seasons)
+
+data = load_players(provider, league, season)
+st.dataframe(data, height=600, use_container_width=True,)
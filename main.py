@@ -1,15 +1,18 @@
 import streamlit as st
-from utilities.utils import get_players_by_position, get_metrics_by_position
-from visualizations.radar_chart import create_radar_chart
-from visualizations.pizza_chart import create_pizza_chart
-from visualizations.overall_rank import create_rank_visualization
-from visualizations.scatter_plot import create_scatter_chart
-from visualizations.zscore_ranking import top_10_players_by_profile
-from visualizations.similarity_chart import filter_similar_players
-from visualizations.weighted_rank import get_weighted_rank
+import os
+import tempfile
+from utilities.utils import get_players_by_position, get_metrics_by_position, get_player_season_query, league_rankings
+from analytics.api import load_players, render_chart, overall_rank, leaderboard, zscore_profile, zscore_profile_names
+from analytics.api import similar_players, player_weighted_rank, weighted_rank
+from visualizations.overall_rank import style_overall_rank
+from visualizations.scatter_plot import create_scatter_chart, create_interactive_scatter_chart
+from utilities.chart_cache import get_chart_image
+from visualizations.svg_charts import svg_image_html
+from visualizations.batch_charts import batch_render, league_targets, batch_chart_functions, batch_output_formats
+from visualizations.similarity_chart import batch_similar_players, similar_players_workbook
+from utilities.options import get_page_options, panel_open
 from utilities.statbomb_default_metrics import profiles_zcore as profiles
 from st_pages import show_pages_from_config
-from data.retrieve_statbomb_data import get_statsbomb_player_season_stats
 
 show_pages_from_config()
 st.set_page_config(
@@ -70,62 +73,69 @@ st.markdown("""
 
 st.markdown("")
 with st.spinner("Retrieving data from statsbomb api"):
-    statsbomb_data = get_statsbomb_player_season_stats()
-leagues = list(statsbomb_data['League'].unique())
-leagues.append('All')
-seasons = list(statsbomb_data['Season'].unique())
-playing_positions = list(statsbomb_data['Position'].unique())
-playing_positions.append("Number 6")
-
-with st.expander("Expand to view pizza chart", expanded=False):
+    statsbomb_data = load_players('statsbomb')
+failed_competitions = statsbomb_data.attrs.get('failed_competitions', [])
+if failed_competitions:
+    failed_names = ", ".join(f"{c['competition_name']} {c['season_name']}" for c in failed_competitions)
+    st.warning(f"Could not retrieve {len(failed_competitions)} competition(s): {failed_names}")
+# Option lists are worked out once per data version, not on every rerun
+options = get_page_options(statsbomb_data)
+leagues = options.leagues + ['All']
+seasons = options.seasons
+playing_positions = options.playing_positions
+
+if panel_open("Expand to view pizza chart", 'pizza_panel', ['pizza_league', 'pizza_season', 'pizza_pos', 'pizza_player', 'pizza_svg']):
 
     league = st.selectbox('Select League:',leagues[::-1], index=0, key='pizza_league')
     season = st.selectbox('Select Season:', seasons, index=0, key='pizza_season')
 
     position = st.selectbox('Select Playing Position:', playing_positions, index=0, key='pizza_pos')
-    if position == 'Number 6':
-        player_name = st.selectbox('Select Player:', get_players_by_position(statsbomb_data, league, season, "Number 8"), index=0, key='pizza_player')
-    else:
-        player_name = st.selectbox('Select Player:', get_players_by_position(statsbomb_data, league, season, position), index=0, key='pizza_player')
+    player_name = st.selectbox('Select Player:', get_players_by_position(statsbomb_data, league, season, position), index=0, key='pizza_player')
+
+    fast_pizza = st.checkbox('Fast SVG rendering', value=False, key='pizza_svg')
 
     # Button to generate pizza chart
     if st.button('Generate Pizza Chart'):
         try:
-            fig_pizza = create_pizza_chart(statsbomb_data, league,season, player_name, position)
-            if fig_pizza is not None:
-                st.pyplot(fig_pizza)  # Display the pizza chart
+            if fast_pizza:
+                svg_pizza = render_chart(statsbomb_data, 'pizza', league, season, position, player_name, image_format='svg')
+                st.markdown(svg_image_html(svg_pizza), unsafe_allow_html=True)
+            else:
+                fig_pizza = render_chart(statsbomb_data, 'pizza', league, season, position, player_name)
+                st.image(fig_pizza, use_column_width=True)  # Display the pizza chart
         except Exception as e:
             st.error(f"Error : {e}")
 
-with st.expander("Expand to view player comparison radar chart", expanded=False):
+if panel_open("Expand to view player comparison radar chart", 'radar_panel', ['radar_league', 'radar_season', 'radar_positon', 'radar_player', 'radar_svg']):
     league = st.selectbox('Select League:',leagues[::-1], index=0, key='radar_league')
     season = st.selectbox('Select Season:', seasons, index=0, key='radar_season')
 
     position = st.selectbox('Select Playing Position:', playing_positions, index=0, key='radar_positon')
-    if position == 'Number 6':
-        player_name = st.selectbox('Select Player:', get_players_by_position(statsbomb_data, league, season, 'Number 8'), index=0, key='radar_player')
-    else:
-        player_name = st.selectbox('Select Player:', get_players_by_position(statsbomb_data, league, season, position), index=0, key='radar_player')
+    player_name = st.selectbox('Select Player:', get_players_by_position(statsbomb_data, league, season, position), index=0, key='radar_player')
+
 
+    fast_radar = st.checkbox('Fast SVG rendering', value=False, key='radar_svg')
 
     # Button to generate pizza chart
     if st.button('Generate Radar Chart'):
         try:
-            fig_radar = create_radar_chart(statsbomb_data, league,player_name, position,season)
-            if fig_radar is not None:
-                st.pyplot(fig_radar)  # Display the pizza chart
+            if fast_radar:
+                svg_radar = render_chart(statsbomb_data, 'radar', league, season, position, player_name, image_format='svg')
+                st.markdown(svg_image_html(svg_radar), unsafe_allow_html=True)
+            else:
+                fig_radar = render_chart(statsbomb_data, 'radar', league, season, position, player_name)
+                st.image(fig_radar, use_column_width=True)  # Display the pizza chart
         except Exception as e:
             st.error(f"Error : {e}")
 
-with st.expander("Expand to view scatter plot", expanded=False):
+if panel_open("Expand to view scatter plot", 'scatter_panel', ['scatter_league', 'scatter_season', 'scatter_pos', 'scataer_player', 'scatter_mode']):
     league = st.selectbox('Select League:',leagues[::-1], index=0, key='scatter_league')
-    season = st.selectbox('Select Season:', seasons, index=0, key='scatter_season')
+    season = st.selectbox('Select Season:', seasons + ['All'], index=0, key='scatter_season')
+    # Every season of the chosen leagues
+    season = '' if season == 'All' else season
 
     position = st.selectbox('Select Playing Position:', playing_positions, index=0, key='scatter_pos')
-    if position == 'Number 6':
-        player_name = st.selectbox('Select Player:', get_players_by_position(statsbomb_data, league,season, 'Number 8'), index=0, key='scataer_player')
-    else:
-        player_name = st.selectbox('Select Player:', get_players_by_position(statsbomb_data, league,season, position), index=0, key='scataer_player')
+    player_name = st.selectbox('Select Player:', get_players_by_position(statsbomb_data, league, season, position), index=0, key='scataer_player')
 
     # age_range = st.slider("Select Age Range", min_value=int(df['Age'].min()), max_value=int(df['Age'].max()), 
     #                       value=(int(df['Age'].min()), int(df['Age'].max())))
@@ -135,8 +145,8 @@ with st.expander("Expand to view scatter plot", expanded=False):
                           value=(int(18), int(50)))
 
     minutes_range = st.slider("Select Minutes Played Range", min_value=150, 
-                               max_value=int(statsbomb_data['Minutes'].max()), 
-                               value=(150, int(statsbomb_data['Minutes'].max())))
+                               max_value=options.max_minutes, 
+                               value=(150, options.max_minutes))
 
     metrics = get_metrics_by_position(position)
     x_metric_display = st.selectbox(
@@ -151,16 +161,62 @@ with st.expander("Expand to view scatter plot", expanded=False):
         index=0
     )
 
+    scatter_mode = st.radio('Chart type', ['Static image', 'Interactive (WebGL)'], horizontal=True, key='scatter_mode')
+
     # Button to generate pizza chart
     if st.button(f'Generate Scatter Plot'):
         try:
-            fig_scatter = create_scatter_chart(statsbomb_data, league,season, player_name, position, x_metric_display, y_metric_display, age_range[0], age_range[1], minutes_range[0], minutes_range[1])
-            if fig_scatter is not None:
-                st.pyplot(fig_scatter)  # Display the pizza chart
+            if scatter_mode == 'Interactive (WebGL)':
+                fig_scatter = create_interactive_scatter_chart(statsbomb_data, league, season, player_name, position, x_metric_display, y_metric_display, age_range[0], age_range[1], minutes_range[0], minutes_range[1])
+                st.plotly_chart(fig_scatter, use_container_width=True)
+            else:
+                fig_scatter = get_chart_image(statsbomb_data, 'scatter', create_scatter_chart, league, season, player_name, position, x_metric_display, y_metric_display, age_range[0], age_range[1], minutes_range[0], minutes_range[1])
+                if fig_scatter is not None:
+                    st.image(fig_scatter, use_column_width=True)  # Display the pizza chart
         except Exception as e:
             st.error(f"Error : {e}")
 
-with st.expander("Expand to view players overall rank score", expanded=False):
+if panel_open("Expand to view batch charts", 'batch_chart_panel', ['batch_chart_league', 'batch_chart_season', 'batch_chart_pos', 'batch_chart_players', 'batch_chart_charts', 'batch_chart_format']):
+
+    league = st.selectbox('Select League:', options.leagues, index=0, key='batch_chart_league')
+    season = st.selectbox('Select Season:', seasons, index=0, key='batch_chart_season')
+    position = st.selectbox('Select Playing Position:', playing_positions, index=0, key='batch_chart_pos')
+
+    chart_targets = league_targets(statsbomb_data, league, season, position)
+    shortlist = st.multiselect('Select Players (all when empty):', chart_targets['Player Name'].tolist(), key='batch_chart_players')
+    charts = st.multiselect('Select Charts:', list(batch_chart_functions), default=list(batch_chart_functions), key='batch_chart_charts')
+    output_format = st.radio('Output:', batch_output_formats, format_func=lambda f: {'zip': 'Zip of PNG files', 'pdf': 'Multi-page PDF'}[f], key='batch_chart_format')
+
+    if st.button('Generate Charts'):
+        try:
+            if shortlist:
+                chart_targets = chart_targets[chart_targets['Player Name'].isin(shortlist)]
+            total = max(len(chart_targets) * len(charts), 1)
+            progress_bar = st.progress(0.0, text=f"Rendering {total} charts")
+            rendered = []
+
+            def show_progress(task):
+                rendered.append(task)
+                progress_bar.progress(len(rendered) / total, text=f"Rendered {task[0]} for {task[1]} ({len(rendered)}/{total})")
+
+            with tempfile.TemporaryDirectory() as folder:
+                path = os.path.join(folder, f"charts.{output_format}")
+                errors = batch_render(statsbomb_data, chart_targets, path, charts, output_format, progress=show_progress)
+                with open(path, 'rb') as f:
+                    chart_pack = f.read()
+
+            if errors:
+                st.warning("Skipped: " + ", ".join(f"{task[1]} {task[0]} ({error})" for task, error in errors))
+            st.download_button(
+                label="Download Charts",
+                data=chart_pack,
+                file_name=f"{league}_{position}_{season.replace('/', '-')}_charts.{output_format}",
+                mime='application/pdf' if output_format == 'pdf' else 'application/zip'
+            )
+        except Exception as e:
+            st.error(f"Error : {e}")
+
+if panel_open("Expand to view players overall rank score", 'rank_panel', ['rank_league', 'rak__season', 'rank_pos']):
 
     league = st.selectbox('Select League:',leagues[::-1], index=0, key='rank_league')
     season = st.selectbox('Select Season:', seasons, index=0, key='rak__season')
@@ -170,7 +226,7 @@ with st.expander("Expand to view players overall rank score", expanded=False):
     # Button to generate pizza chart
     if st.button(f'Generate Overall Ranks for {position}'):
         try:
-            fig_roverall = create_rank_visualization(statsbomb_data, league,season, position)
+            fig_roverall = style_overall_rank(overall_rank(statsbomb_data, league, season, position))
             if fig_roverall is not None:
                 with st.container():
                     st.write(
@@ -189,32 +245,42 @@ with st.expander("Expand to view players overall rank score", expanded=False):
         except Exception as e:
             st.error(f"Error : {e}")
 
-with st.expander("Expand to view players zscore rank score", expanded=False):
+if panel_open("Expand to view leaderboard across leagues", 'board_panel', ['board_season', 'board_pos', 'board_k']):
+
+    season = st.selectbox('Select Season:', seasons, index=0, key='board_season')
+    board_positions = st.multiselect('Select Playing Positions (all when empty):', options.positions, key='board_pos')
+    top_k_players = st.number_input('Players per League and Position', min_value=1, max_value=50, value=10, key='board_k')
+
+    if st.button('Generate Leaderboard'):
+        try:
+            leaderboard_df = leaderboard(statsbomb_data, season, positions=board_positions, k=top_k_players)
+            st.dataframe(leaderboard_df, use_container_width=True)
+        except Exception as e:
+            st.error(f"Error : {e}")
+
+if panel_open("Expand to view players zscore rank score", 'zscore_panel', ['ra_lague', 'ra_seaosn', 'ra_prof']):
     league = st.selectbox('Select League:',leagues[::-1], index=0, key='ra_lague')
     season = st.selectbox('Select Season:', seasons, index=0, key='ra_seaosn')
 
     position = st.selectbox("Select Player Position", options=list(profiles.keys()), key='ra_prof')
-    profile_options = [profile["Profile Name"] for profile in profiles[position]]
+    profile_options = zscore_profile_names(position)
     profile_name = st.selectbox("Select Profile", options=profile_options)
 
     # Button to generate pizza chart
     if st.button(f'Generate Zscore Ranks'):
         try:
-            top_10_players = top_10_players_by_profile(league, season, position, profile_name, statsbomb_data)
+            top_10_players = zscore_profile(statsbomb_data, league, season, position, profile_name)
             st.dataframe(top_10_players, use_container_width=True)
         except Exception as e:
             st.error(f"Error : {e}")
 
-with st.expander("Expand to view player similarity", expanded=False):
+if panel_open("Expand to view player similarity", 'sim_panel', ['sim_lague', 'sim_seaosn', 'sim_pos', 'sim_player']):
 
     league = st.selectbox('Select League:',leagues[::-1], index=0, key='sim_lague')
     season = st.selectbox('Select Season:', seasons, index=0, key='sim_seaosn')
 
     position = st.selectbox('Select Playing Position:', playing_positions, index=0, key='sim_pos')
-    if position == 'Number 6':
-        player_name = st.selectbox('Select Player:', get_players_by_position(statsbomb_data, league,season, 'Number 8'), index=0, key='sim_player')
-    else:
-        player_name = st.selectbox('Select Player:', get_players_by_position(statsbomb_data, league,season, position), index=0, key='sim_player')
+    player_name = st.selectbox('Select Player:', get_players_by_position(statsbomb_data, league, season, position), index=0, key='sim_player')
 
     similarity_threshold = st.slider('Similarity Percent Threshold (%)', 50, 100, 90) / 100  # Converts slider percentage to decimal
 
@@ -224,13 +290,13 @@ with st.expander("Expand to view player similarity", expanded=False):
     # Button to generate pizza chart
     if st.button(f'Generate similar players'):
         try:
-            similar_players_df = filter_similar_players(
-                statsbomb_data, 
-                player_name=player_name,
-                league_name=league,
-                position=position,
-                season=season,
-                similarity_threshold=similarity_threshold, 
+            similar_players_df = similar_players(
+                statsbomb_data,
+                league,
+                season,
+                position,
+                player_name,
+                similarity_threshold=similarity_threshold,
                 max_age=max_age
             )
         # Display similar players
@@ -239,21 +305,56 @@ with st.expander("Expand to view player similarity", expanded=False):
             st.error(f"Error : {e}")
 
 
-with st.expander("Expand to view players weighted rank", expanded=False):
+if panel_open("Expand to view batch player similarity", 'batch_sim_panel', ['batch_sim_league', 'batch_sim_season', 'batch_sim_team', 'batch_sim_players', 'batch_sim_leagues', 'batch_sim_k', 'batch_sim_age']):
+
+    league = st.selectbox('Select League:', options.leagues, index=0, key='batch_sim_league')
+    season = st.selectbox('Select Season:', seasons, index=0, key='batch_sim_season')
 
-    league = st.selectbox('Select League:', list(statsbomb_data['League'].unique()) , index=0, key='werank_league')
+    squad_data = get_player_season_query(statsbomb_data).peer_group(league, season)
+    team = st.selectbox('Select Team:', sorted(squad_data['Team'].astype(str).unique()), index=0, key='batch_sim_team')
+    squad_data = squad_data[squad_data['Team'].astype(str) == team]
+    target_names = st.multiselect('Select Players:', squad_data['Player Name'].tolist(),
+                                  default=squad_data['Player Name'].tolist(), key='batch_sim_players')
+
+    compare_leagues = st.multiselect('Compare Against Leagues (all when empty):', options.leagues, key='batch_sim_leagues')
+    k = st.number_input('Similar Players per Target', min_value=1, max_value=50, value=10, key='batch_sim_k')
+    max_age = st.number_input('Maximum Age', min_value=18, max_value=60, value=30, key='batch_sim_age')
+
+    if st.button('Generate similar players for squad'):
+        try:
+            targets = squad_data[squad_data['Player Name'].isin(target_names)][['Player Name', 'Position', 'League', 'Season']]
+            similar_players_df, skipped = batch_similar_players(statsbomb_data, targets, k=k, max_age=max_age, leagues=compare_leagues)
+            if skipped:
+                st.warning("Skipped: " + ", ".join(f"{name} ({reason})" for name, reason in skipped))
+            st.dataframe(similar_players_df, use_container_width=True)
+
+            st.download_button(
+                label="Download as CSV",
+                data=similar_players_df.to_csv(index=False),
+                file_name=f"{team}_{season.replace('/', '-')}_similar_players.csv",
+                mime="text/csv"
+            )
+            st.download_button(
+                label="Download as Excel",
+                data=similar_players_workbook(similar_players_df),
+                file_name=f"{team}_{season.replace('/', '-')}_similar_players.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+        except Exception as e:
+            st.error(f"Error : {e}")
+
+if panel_open("Expand to view players weighted rank", 'werank_panel', ['werank_league', 'werak__season', 'werank_pos', 'wesim_player']):
+
+    league = st.selectbox('Select League:', options.leagues , index=0, key='werank_league')
     season = st.selectbox('Select Season:', seasons, index=0, key='werak__season')
 
     position = st.selectbox('Select Playing Position:', playing_positions, index=0, key='werank_pos')
-    if position == 'Number 6':
-        player_name = st.selectbox('Select Player:', get_players_by_position(statsbomb_data, league,season, 'Number 8'), index=0, key='wesim_player')
-    else:
-        player_name = st.selectbox('Select Player:', get_players_by_position(statsbomb_data, league,season, position), index=0, key='wesim_player')
+    player_name = st.selectbox('Select Player:', get_players_by_position(statsbomb_data, league, season, position), index=0, key='wesim_player')
 
     # Button to generate pizza chart
     if st.button(f'Generate Weighted Rank'):
         try:
-            fig_roverall = get_weighted_rank(statsbomb_data, player_name, league, season, position)
+            fig_roverall = player_weighted_rank(statsbomb_data, league, season, position, player_name)
             if fig_roverall is not None:
                 with st.container():
                     st.write(
@@ -271,3 +372,24 @@ with st.expander("Expand to view players weighted rank", expanded=False):
                     st.dataframe(fig_roverall, use_container_width=True)
         except Exception as e:
             st.error(f"Error : {e}")
+
+if panel_open("Expand to view global weighted leaderboard", 'global_panel', ['global_season', 'global_pos', 'global_reference', 'global_minutes', 'global_age', 'global_n', 'global_sort']):
+
+    season = st.selectbox('Select Season:', seasons, index=0, key='global_season')
+    position = st.selectbox('Select Playing Position:', ['All'] + playing_positions, index=0, key='global_pos')
+    reference_leagues = sorted(league_rankings)
+    reference_league = st.selectbox('Weight Against League:', reference_leagues, index=reference_leagues.index('League Two'), key='global_reference')
+    min_minutes = st.number_input('Minimum Minutes', min_value=0, value=0, key='global_minutes')
+    max_age = st.number_input('Maximum Age', min_value=15, max_value=45, value=45, key='global_age')
+    top_n = st.number_input('Number of Players', min_value=1, max_value=500, value=50, key='global_n')
+    sort_by = st.radio('Sort By:', ['Weighted Score', 'Overall Score'], key='global_sort')
+
+    if st.button('Generate Global Leaderboard'):
+        try:
+            global_df = weighted_rank(
+                statsbomb_data, 'All', season, None if position == 'All' else position, reference_league=reference_league,
+                min_minutes=min_minutes, max_age=max_age, n=top_n, sort_by=sort_by
+            )
+            st.dataframe(global_df, use_container_width=True)
+        except Exception as e:
+            st.error(f"Error : {e}")
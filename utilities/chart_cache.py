@@ -0,0 +1,175 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+import matplotlib.pyplot as plt
+from .query import get_frame_version
+
+chart_cache_dir = './data/chart_cache/'
+# Bump when a chart's look changes, so images rendered by older code aren't served
+chart_cache_version = 1
+# Size limits of the two tiers, in bytes of rendered images
+memory_cache_bytes = 64 * 1024 * 1024
+disk_cache_bytes = 512 * 1024 * 1024
+
+# Same rendering as st.pyplot, so a cached image looks exactly like the figure would
+savefig_options = {'bbox_inches': 'tight', 'dpi': 200}
+
+
+def chart_key(data_version, chart, params, api):
+    """
+    Cache key of a rendered chart: a hash of (data version, chart type, parameters,
+    provider) and the cache version.
+    """
+    key = json.dumps([chart_cache_version, data_version, chart, list(params), api], default=str)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class ChartCache:
+    """
+    Rendered chart images in two tiers: a least recently used in-memory cache shared by
+    every session of the process, and a size-capped directory on disk that survives
+    restarts, where the least recently used files are removed first.
+    """
+
+    def __init__(self, folder_path=chart_cache_dir, memory_bytes=memory_cache_bytes, disk_bytes=disk_cache_bytes):
+        self.folder_path = folder_path
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        self.lock = threading.Lock()
+
+    def path(self, key, image_format):
+        return os.path.join(self.folder_path, f'{key}.{image_format}')
+
+    def get(self, key, image_format='png'):
+        with self.lock:
+            if (key, image_format) in self.memory:
+                self.memory.move_to_end((key, image_format))
+                return self.memory[(key, image_format)]
+
+        path = self.path(key, image_format)
+        try:
+            with open(path, 'rb') as f:
+                image = f.read()
+            # The modification time marks when a file was last used
+            os.utime(path)
+        except OSError:
+            return None
+        self.remember(key, image_format, image)
+        return image
+
+    def put(self, key, image, image_format='png'):
+        self.remember(key, image_format, image)
+        if self.disk_bytes <= 0:
+            return
+        try:
+            os.makedirs(self.folder_path, exist_ok=True)
+            # Written under a temporary name first, so a reader never sees half a file
+            temp_path = self.path(key, image_format) + f'.{threading.get_ident()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(image)
+            os.replace(temp_path, self.path(key, image_format))
+            self.evict_disk()
+        except OSError:
+            # The disk tier is best effort, the memory tier still has the image
+            pass
+
+    def remember(self, key, image_format, image):
+        if len(image) > self.memory_bytes:
+            return
+        with self.lock:
+            if (key, image_format) in self.memory:
+                self.memory_size -= len(self.memory.pop((key, image_format)))
+            self.memory[(key, image_format)] = image
+            self.memory_size += len(image)
+            while self.memory_size > self.memory_bytes:
+                _, evicted = self.memory.popitem(last=False)
+                self.memory_size -= len(evicted)
+
+    def evict_disk(self):
+        files = []
+        with os.scandir(self.folder_path) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.memory_size = 0
+        if os.path.isdir(self.folder_path):
+            for name in os.listdir(self.folder_path):
+                try:
+                    os.remove(os.path.join(self.folder_path, name))
+                except OSError:
+                    pass
+
+
+_chart_cache = ChartCache()
+
+
+def get_chart_cache():
+    """
+    Returns the chart cache shared by every session of the process.
+    """
+    return _chart_cache
+
+
+def render_figure(fig, image_format='png'):
+    """
+    The figure as PNG or SVG bytes, rendered like st.pyplot. The figure is closed.
+    """
+    image = io.BytesIO()
+    fig.savefig(image, format=image_format, **savefig_options)
+    plt.close(fig)
+    return image.getvalue()
+
+
+def get_chart_image(df, chart, create_chart, *params, api='statbomb', image_format='png'):
+    """
+    Rendered image of create_chart(df, *params, api=api), served from the chart cache
+    when the same chart of the same data version was rendered before.
+
+    Parameters:
+        df (pd.DataFrame): Player data, stamped with its data version by the data layer.
+        chart (str): Chart type, e.g. 'pizza'.
+        create_chart (function): Builds the matplotlib figure, or returns None. A chart
+            that renders itself returns its image bytes instead.
+        params: The chart's parameters after df, as passed to create_chart.
+        api (str): Data provider.
+        image_format (str): 'png' or 'svg'.
+
+    Returns:
+        bytes: The rendered image, or None when create_chart returned None. Frames
+        without a data version are rendered every time.
+    """
+    data_version = get_frame_version(df)
+    key = chart_key(data_version, chart, params, api) if data_version is not None else None
+    cache = get_chart_cache()
+
+    if key is not None:
+        image = cache.get(key, image_format)
+        if image is not None:
+            return image
+
+    fig = create_chart(df, *params, api=api)
+    if fig is None:
+        return None
+    image = fig if isinstance(fig, bytes) else render_figure(fig, image_format)
+    if key is not None:
+        cache.put(key, image, image_format)
+    return image
@@ -0,0 +1,86 @@
+import io
+import zipfile
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+
+# File extension and mime type of each bulk export format
+export_formats = {
+    'xlsx': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('.zip', 'application/zip'),
+    'parquet': ('.zip', 'application/zip'),
+}
+
+
+def unique_sheet_name(name, sheet_names):
+    """
+    Excel sheet names are limited to 31 characters, can't contain []:*?/\\ and must be
+    unique, so name is cleaned, cut and numbered if needed, then added to sheet_names.
+    """
+    base_name = str(name).translate(str.maketrans('', '', '[]:*?/\\'))
+    sheet_name = base_name[:31]
+    suffix = 2
+    while sheet_name in sheet_names:
+        sheet_name = f"{base_name[:26]} ({suffix})"
+        suffix += 1
+    sheet_names.add(sheet_name)
+    return sheet_name
+
+
+def frame_rows(df):
+    # Plain python values row by row, with missing values as None (an empty cell)
+    columns = [df[column].astype(object).where(df[column].notna(), None).tolist() for column in df.columns]
+    return zip(*columns)
+
+
+def write_workbook(path, frames, progress=None):
+    """
+    Writes every (name parts, DataFrame) of frames to its own sheet of the workbook at
+    path. xlsxwriter's constant memory mode flushes each row to disk as it is written,
+    so only the frame being written is ever held in memory.
+    """
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    sheet_names = set()
+    for parts, df in frames:
+        worksheet = workbook.add_worksheet(unique_sheet_name(' '.join(parts), sheet_names))
+        worksheet.write_row(0, 0, list(df.columns))
+        for i, row in enumerate(frame_rows(df), start=1):
+            worksheet.write_row(i, 0, row)
+        if progress is not None:
+            progress(parts)
+    workbook.close()
+
+
+def write_zip(path, frames, file_format='csv', progress=None):
+    """
+    Writes every (name parts, DataFrame) of frames as a CSV or Parquet file named after
+    its parts (e.g. League/Season/Position.csv) into the zip at path, streaming each
+    file into the archive.
+    """
+    extension = '.csv' if file_format == 'csv' else '.parquet'
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for parts, df in frames:
+            name = '/'.join(str(part).replace('/', '-') for part in parts) + extension
+            with archive.open(name, 'w') as f:
+                if file_format == 'csv':
+                    with io.TextIOWrapper(f, encoding='utf-8', newline='') as text:
+                        df.to_csv(text, index=False)
+                else:
+                    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), f)
+            if progress is not None:
+                progress(parts)
+
+
+def write_export(path, frames, file_format='xlsx', progress=None):
+    """
+    Writes frames, an iterable of (name parts, DataFrame), to path as one multi-sheet
+    workbook ('xlsx') or a zip of CSV ('csv') or Parquet ('parquet') files. frames is
+    consumed one at a time, so it can be a generator reading each frame on demand.
+    progress is called with the name parts after each frame is written.
+    """
+    if file_format not in export_formats:
+        raise ValueError(f"Unknown export format '{file_format}', expected one of {', '.join(export_formats)}")
+    if file_format == 'xlsx':
+        write_workbook(path, frames, progress)
+    else:
+        write_zip(path, frames, file_format, progress)
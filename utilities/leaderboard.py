@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from .percentiles import get_percentile_cube
+from .query import get_derived, resolve_position
+from .topk import top_k
+from .utils import league_rankings
+
+overall_peer_level = ('League', 'Season', 'Position')
+
+
+class WeightedLeaderboard:
+    """
+    Overall score of every player-season for every position with metrics, within its
+    league, season and position, built in one pass over the percentile cube, with the
+    league coefficients joined on as a lookup.
+
+    Positions are listed under the names offered in the UI, so an alias like the
+    StatsBomb Number 6 appears with its own metrics next to the position it is
+    stored under. Aliases repeat the player-seasons of that position, so they're only
+    listed when asked for by name.
+    """
+
+    def __init__(self, query):
+        cube = get_percentile_cube(query.df, query.api)
+        parts = []
+        aliases = []
+        for position, metrics in cube.metrics_per_position.items():
+            if any(metric not in cube.metric_index for metric in metrics):
+                continue
+            rows = query.rows('All', '', position)
+            if len(rows) == 0:
+                continue
+            with np.errstate(all='ignore'):
+                scores = np.nanmean(cube.take(rows, overall_peer_level, metrics), axis=1)
+
+            part = query.df.iloc[rows][['Player Name', 'Team', 'League', 'Season', 'Age', 'Minutes']]
+            part = part.astype({'Team': str, 'League': str, 'Season': str}).reset_index(drop=True)
+            part.insert(4, 'Position', position)
+            part['Overall Score'] = scores
+            parts.append(part)
+            aliases.append(np.full(len(part), resolve_position(position, query.api) != position))
+
+        columns = ['Player Name', 'Team', 'League', 'Season', 'Position', 'Age', 'Minutes', 'Overall Score']
+        table = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+        table['League Coefficient'] = table['League'].map(league_rankings).astype('float64')
+        self.table = table
+        self.alias = np.concatenate(aliases) if aliases else np.zeros(0, dtype=bool)
+
+    def scores(self, league='All', season='', position=None, reference_league='League Two',
+               min_minutes=None, max_age=None, n=None, sort_by='Overall Score'):
+        """
+        Overall and league-weighted scores of the players matching the filters.
+
+        Parameters:
+            league, season (str): 'All' / '' for every league / season.
+            position (str): Position as offered in the UI, None for every position as
+                stored, so each player-season is listed once.
+            reference_league (str): League the weighted score is relative to.
+            min_minutes (int), max_age (int): Optional minutes and age limits.
+            n (int): Only return the best n by sort_by.
+            sort_by (str): 'Overall Score' or 'Weighted Score'.
+
+        Returns:
+            pd.DataFrame: Best first, with the overall score, the league coefficient and
+            'Score weighted against <reference_league>'. Players from leagues without a
+            coefficient have no weighted score.
+        """
+        table = self.table
+        mask = np.ones(len(table), dtype=bool)
+        if league not in ['All', '']:
+            mask &= (table['League'] == league).to_numpy()
+        if season != '':
+            mask &= (table['Season'] == season).to_numpy()
+        if position is None:
+            mask &= ~self.alias
+        else:
+            mask &= (table['Position'] == position).to_numpy()
+        if min_minutes is not None:
+            mask &= (table['Minutes'] >= min_minutes).to_numpy()
+        if max_age is not None:
+            mask &= (table['Age'] <= max_age).to_numpy()
+        table = table[mask]
+
+        overall = table['Overall Score'].to_numpy()
+        # Overall scores are shown as whole numbers and weighted from those, as before
+        whole_overall = np.floor(overall)
+        weighted = whole_overall * (table['League Coefficient'].to_numpy() / league_rankings[reference_league])
+
+        ranking = weighted if sort_by == 'Weighted Score' else overall
+        order = top_k(ranking, len(ranking) if n is None else n)
+
+        result = table.iloc[order].reset_index(drop=True)
+        result['Overall Score'] = pd.array(whole_overall[order]).astype('Int64')
+        result[f'Score weighted against {reference_league}'] = weighted[order]
+        return result
+
+
+def get_weighted_leaderboard(df, api='statbomb'):
+    """
+    Returns the global weighted leaderboard for df, computed once per data version.
+    """
+    return get_derived(df, api, 'weighted_leaderboard', WeightedLeaderboard)
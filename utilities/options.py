@@ -0,0 +1,55 @@
+from .query import get_derived, position_aliases
+
+
+class PageOptions:
+    """
+    The option lists the analysis pages offer (leagues, seasons, positions, players of
+    a league-season-position, the minutes range), worked out once per data version
+    rather than on every rerun. Lists are shared by every session, so callers build
+    new lists from them rather than appending to them.
+    """
+
+    def __init__(self, query):
+        df = query.df
+        self.query = query
+        self.leagues = [str(league) for league in df['League'].unique()]
+        self.seasons = [str(season) for season in df['Season'].unique()]
+        self.positions = [str(position) for position in df['Position'].unique()]
+        # Positions stored under another position are offered after the stored ones
+        self.playing_positions = self.positions + list(position_aliases.get(query.api, {}))
+        self.max_minutes = int(df['Minutes'].max())
+        self._players = {}
+
+    def players(self, league='All', season='', position=None):
+        key = (league, season, position)
+        if key not in self._players:
+            self._players[key] = self.query.players(league, season, position)
+        return self._players[key]
+
+
+def panel_open(label, key, widget_keys):
+    """
+    A checkbox opening one panel of a page, True when open. Streamlit reruns the whole
+    page on every interaction and an expander runs its contents even when closed, so a
+    panel that isn't open creates no widgets and does no work.
+
+    Streamlit drops the state of widgets that aren't drawn, so while the panel is closed
+    the values of its widgets (by widget_keys) are set again through session state,
+    to be there when it reopens.
+    """
+    # Imported here, so the headless analyses don't load Streamlit through utilities
+    import streamlit as st
+
+    opened = st.checkbox(label, key=key)
+    if not opened:
+        for widget_key in widget_keys:
+            if widget_key in st.session_state:
+                st.session_state[widget_key] = st.session_state[widget_key]
+    return opened
+
+
+def get_page_options(df, api='statbomb'):
+    """
+    Returns the option lists of the analysis pages for df, computed once per data version.
+    """
+    return get_derived(df, api, 'page_options', PageOptions)
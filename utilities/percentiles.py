@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+from .statbomb_default_metrics import metrics_per_position as statbomb_metrics_per_position
+from .wyscout_default_metrics import metrics_per_position as wyscout_metrics_per_position
+from .query import get_derived
+
+metrics_per_position_by_api = {
+    'statbomb': statbomb_metrics_per_position,
+    'wyscout': wyscout_metrics_per_position,
+}
+
+# Percentiles are stored as whole numbers 0-100, with 255 marking a missing metric value
+missing_percentile = 255
+
+
+def peer_level(league, season):
+    """
+    Columns a peer group is defined by for a league and season selection, where 'All'
+    or '' drop the league and '' drops the season.
+    """
+    keys = []
+    if league not in ['All', '']:
+        keys.append('League')
+    if season != '':
+        keys.append('Season')
+    return tuple(keys) + ('Position',)
+
+
+class PercentileCube:
+    """
+    Percentile rank of every player-season in every position metric, within its peer
+    group, computed once per data version.
+
+    Each level ((League, Season, Position), (Season, Position), ...) is one vectorized
+    groupby-rank over the whole frame, stored as a uint8 array aligned with its rows,
+    so a peer group's percentiles are a take with the rows from the query index.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        df = query.df
+        self.metrics_per_position = metrics_per_position_by_api.get(query.api, {})
+        self.metrics = [m for m in dict.fromkeys(m for ms in self.metrics_per_position.values() for m in ms) if m in df.columns]
+        self.metric_index = {metric: i for i, metric in enumerate(self.metrics)}
+        self.levels = {}
+        self._average_cache = {}
+
+    def level(self, keys):
+        if keys not in self.levels:
+            df = self.query.df
+            ranks = df.groupby(list(keys), observed=True, sort=False)[self.metrics].rank(pct=True) * 100
+            ranks = ranks.round(0).fillna(missing_percentile)
+            self.levels[keys] = ranks.to_numpy(dtype=np.uint8)
+        return self.levels[keys]
+
+    def take(self, rows, keys, metrics):
+        """
+        Percentiles of the given rows within their peer group at level keys, as a float
+        array with NaN where the metric value is missing.
+        """
+        columns = [self.metric_index[metric] for metric in metrics]
+        values = self.level(keys)[np.ix_(rows, columns)].astype('float64')
+        values[values == missing_percentile] = np.nan
+        return values
+
+    def peer_percentiles(self, league='All', season='', position=None, metrics=None):
+        """
+        Percentiles of the peer group as a float frame indexed like query.peer_group,
+        NaN where the metric value is missing.
+        """
+        metrics = self.metrics if metrics is None else metrics
+        rows = self.query.rows(league, season, position)
+        return pd.DataFrame(self.take(rows, peer_level(league, season), metrics), index=self.query.df.index[rows], columns=metrics)
+
+    def player_percentiles(self, player_name, league='All', season='', position=None, metrics=None):
+        """
+        The player's rows in the peer group with their metrics replaced by percentiles,
+        or None when the player isn't in it.
+        """
+        metrics = self.metrics if metrics is None else metrics
+        rows = self.query.player_positions(player_name, league, season, position)
+        if len(rows) == 0:
+            return None
+        player_df = self.query.df.iloc[rows].reset_index(drop=True)
+        player_df[metrics] = self.take(rows, peer_level(league, season), metrics)
+        return player_df
+
+    def average_percentiles(self, league='All', season='', position=None, metrics=None):
+        """
+        Percentile of the peer group's mean in each metric, ranked against every
+        position in the league-season together with that mean, as in
+        utilities.utils.get_avg_metrics_percentile_ranks. Returns a one row frame.
+        """
+        metrics = self.metrics if metrics is None else metrics
+        key = (league, season, position, tuple(metrics))
+        if key not in self._average_cache:
+            means = self.query.peer_group(league, season, position)[metrics].mean()
+            field = self.query.peer_group(league, season)[metrics]
+            percentiles = {}
+            for metric in metrics:
+                values = field[metric].to_numpy(dtype='float64')
+                values = np.sort(values[~np.isnan(values)])
+                mean = float(means[metric])
+                if np.isnan(mean):
+                    percentiles[metric] = np.nan
+                    continue
+                # Average rank of the mean once inserted among the existing values
+                below = np.searchsorted(values, mean, side='left')
+                tied = np.searchsorted(values, mean, side='right') - below
+                percentiles[metric] = (below + (tied + 2) / 2) / (len(values) + 1) * 100
+            average = pd.DataFrame([percentiles], columns=metrics)
+            average['Player Name'] = 'AVG'
+            self._average_cache[key] = average
+        return self._average_cache[key]
+
+
+def get_percentile_cube(df, api='statbomb'):
+    """
+    Returns the percentile cube for df, computed once per data version.
+    """
+    return get_derived(df, api, 'percentile_cube', PercentileCube)
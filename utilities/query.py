@@ -0,0 +1,136 @@
+import weakref
+import numpy as np
+
+# Positions offered in the UI that are stored under another position in the data
+position_aliases = {
+    'statbomb': {'Number 6': 'Number 8'},
+    'wyscout': {'Number 8': 'Number 6', 'Number 10': 'Number 6'},
+}
+
+# Query objects built for the most recent data versions, shared by every page and session
+_query_cache = {}
+_query_cache_size = 4
+
+# The frames the data layer stamped with a version token, by id. pandas copies attrs
+# into copies and filtered frames, so a token is only trusted on the frame it was set on
+_versioned_frames = {}
+
+
+def resolve_position(position, api='statbomb'):
+    return position_aliases.get(api, {}).get(position, position)
+
+
+def set_data_version(df, data_version):
+    """
+    Stamps df with the version token of its content. Only frames produced by the data
+    layer are stamped; frames derived from them later inherit the token in attrs but
+    are not trusted with it, see get_frame_version.
+    """
+    df.attrs['data_version'] = data_version
+    key = id(df)
+
+    def forget(ref):
+        if _versioned_frames.get(key) is ref:
+            del _versioned_frames[key]
+
+    _versioned_frames[key] = weakref.ref(df, forget)
+    return df
+
+
+def get_frame_version(df):
+    """
+    The version token of df when df itself was stamped by set_data_version, or None,
+    e.g. for a copy or a filtered frame that only inherited the token in its attrs.
+    """
+    ref = _versioned_frames.get(id(df))
+    if ref is None or ref() is not df:
+        return None
+    return df.attrs.get('data_version')
+
+
+class PlayerSeasonQuery:
+    """
+    Row index over one provider's player-season frame, built once per data load.
+
+    Holds the row positions of every (League, Season, Position) group and of every
+    player name, so a peer group is a lookup plus one take instead of a chain of
+    boolean masks over the whole frame.
+    """
+
+    def __init__(self, df, api='statbomb'):
+        self.df = df
+        self.api = api
+        self.data_version = get_frame_version(df)
+        self.groups = df.groupby(['League', 'Season', 'Position'], observed=True, sort=False).indices
+        self.player_index = df.groupby('Player Name', observed=True, sort=False).indices
+        self.player_names = df['Player Name'].to_numpy()
+        self._rows_cache = {}
+        # Objects computed from this frame, see get_derived
+        self.derived = {}
+
+    def rows(self, league='All', season='', position=None):
+        """
+        Sorted row positions for a league ('All' or '' for every league), a season
+        ('' for every season) and a position (None for every position, aliases resolved).
+        """
+        if position is not None:
+            position = resolve_position(position, self.api)
+        key = (league, season, position)
+        if key not in self._rows_cache:
+            parts = [
+                index for (group_league, group_season, group_position), index in self.groups.items()
+                if (league in ['All', ''] or group_league == league)
+                and (season == '' or group_season == season)
+                and (position is None or group_position == position)
+            ]
+            # Keep the original frame order so ties rank and sort exactly as before
+            rows = np.sort(np.concatenate(parts)) if parts else np.array([], dtype=np.intp)
+            self._rows_cache[key] = rows
+        return self._rows_cache[key]
+
+    def peer_group(self, league='All', season='', position=None):
+        return self.df.iloc[self.rows(league, season, position)]
+
+    def players(self, league='All', season='', position=None):
+        return self.player_names[self.rows(league, season, position)].tolist()
+
+    def player_positions(self, player_name, league='All', season='', position=None):
+        player_rows = self.player_index.get(player_name, np.array([], dtype=np.intp))
+        if league in ['All', ''] and season == '' and position is None:
+            return player_rows
+        return np.intersect1d(player_rows, self.rows(league, season, position), assume_unique=True)
+
+    def player_rows(self, player_name, league='All', season='', position=None):
+        return self.df.iloc[self.player_positions(player_name, league, season, position)]
+
+
+def get_player_season_query(df, api='statbomb'):
+    """
+    Returns the shared query object for df, building it on first use. Frames stamped
+    by the data layer are cached by their version token, as frames with the same token
+    hold the same data; any other frame gets a fresh, uncached query.
+    """
+    data_version = get_frame_version(df)
+    if data_version is None:
+        return PlayerSeasonQuery(df, api)
+
+    key = (api, data_version)
+    query = _query_cache.get(key)
+    if query is None:
+        query = PlayerSeasonQuery(df, api)
+        _query_cache[key] = query
+        while len(_query_cache) > _query_cache_size:
+            _query_cache.pop(next(iter(_query_cache)))
+    return query
+
+
+def get_derived(df, api, name, build):
+    """
+    Returns the object called name computed from df by build(query), building it on
+    first use. It is kept on the shared query object, so it lives exactly as long as
+    the data version it was computed from.
+    """
+    query = get_player_season_query(df, api)
+    if name not in query.derived:
+        query.derived[name] = build(query)
+    return query.derived[name]
@@ -0,0 +1,284 @@
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.neighbors import NearestNeighbors
+from .percentiles import metrics_per_position_by_api
+from .query import get_derived, resolve_position
+
+# Pools up to this size are searched exactly, larger ones through the inverted file
+exact_pool_size = 20000
+# Inverted file settings for the approximate mode
+approximate_lists_per_row = 1 / 200
+approximate_probes = 8
+
+result_columns = ['Player Name', 'Team', 'League', 'Season', 'Position', 'Minutes', 'Age']
+
+
+class PositionSimilarityIndex:
+    """
+    Nearest-neighbour index over one position's player-seasons across every league and
+    season.
+
+    Each player-season is a vector of its position metrics standardized over the whole
+    position pool and scaled by 1 / sqrt(number of metrics), so the euclidean distance
+    between two players is the root mean squared difference of their z-scores and the
+    same radius means the same thing for every position.
+
+    The exact mode uses sklearn's NearestNeighbors. The approximate mode is an inverted
+    file: the pool is clustered with k-means once and a query only scores the players
+    in the clusters closest to the target.
+    """
+
+    def __init__(self, query, position, metrics):
+        self.query = query
+        self.position = resolve_position(position, query.api)
+        self.metrics = [metric for metric in metrics if metric in query.df.columns]
+        self.rows = query.rows('All', '', self.position)
+
+        values = query.df[self.metrics].to_numpy(dtype='float64')[self.rows]
+        mean = np.nanmean(values, axis=0) if len(values) else np.zeros(len(self.metrics))
+        std = np.nanstd(values, axis=0) if len(values) else np.ones(len(self.metrics))
+        std[~(std > 0)] = 1
+        vectors = np.nan_to_num((values - mean) / std) / np.sqrt(max(len(self.metrics), 1))
+        self.vectors = vectors.astype('float32')
+        self.squared_norms = (self.vectors ** 2).sum(axis=1)
+
+        self._exact = None
+        self._centroids = None
+        self._lists = None
+
+    def exact(self):
+        if self._exact is None:
+            self._exact = NearestNeighbors().fit(self.vectors)
+        return self._exact
+
+    def inverted_file(self):
+        if self._centroids is None:
+            n_lists = max(1, min(len(self.vectors), int(len(self.vectors) * approximate_lists_per_row)))
+            kmeans = MiniBatchKMeans(n_clusters=n_lists, n_init=3, random_state=0).fit(self.vectors)
+            self._centroids = kmeans.cluster_centers_
+            self._lists = [np.flatnonzero(kmeans.labels_ == i) for i in range(n_lists)]
+        return self._centroids, self._lists
+
+    def use_exact(self, mode):
+        if mode not in ['auto', 'exact', 'approximate']:
+            raise ValueError(f"Unknown search mode '{mode}', expected auto, exact or approximate")
+        return mode == 'exact' or (mode == 'auto' and len(self.vectors) <= exact_pool_size)
+
+    def candidates(self, target, mode, probes=approximate_probes):
+        """
+        Pool positions worth scoring for target: every one in exact mode, the members
+        of the nearest clusters otherwise.
+        """
+        if self.use_exact(mode):
+            return None
+        centroids, lists = self.inverted_file()
+        order = np.argsort(((centroids - target) ** 2).sum(axis=1))[:probes]
+        return np.sort(np.concatenate([lists[i] for i in order]))
+
+    def search(self, pool_position, k=None, radius=None, allowed=None, mode='auto'):
+        """
+        Returns (pool positions, distances) of the k nearest players, or of every player
+        within radius, to the player-season at pool_position, closest first.
+        allowed is an optional boolean mask over the pool, applied before ranking.
+        """
+        target = self.vectors[pool_position]
+        candidates = self.candidates(target, mode)
+
+        if candidates is None and allowed is None:
+            nn = self.exact()
+            if radius is not None:
+                distances, positions = nn.radius_neighbors([target], radius=radius, sort_results=True)
+                distances, positions = distances[0], positions[0]
+            else:
+                n_neighbors = min(k + 1, len(self.vectors))
+                distances, positions = nn.kneighbors([target], n_neighbors=n_neighbors)
+                distances, positions = distances[0], positions[0]
+        else:
+            # Filtered or approximate searches score their candidate set directly
+            positions = np.arange(len(self.vectors)) if candidates is None else candidates
+            if allowed is not None:
+                positions = positions[allowed[positions]]
+            distances = np.sqrt(((self.vectors[positions] - target) ** 2).sum(axis=1))
+            if radius is not None:
+                keep = distances <= radius
+                positions, distances = positions[keep], distances[keep]
+            order = np.argsort(distances, kind='stable')
+            positions, distances = positions[order], distances[order]
+
+        return positions, distances.astype('float64')
+
+    def distance_matrix(self, pool_positions):
+        """
+        Distances from each player-season at pool_positions to the whole pool, as one
+        (targets x pool) matrix product.
+        """
+        targets = self.vectors[pool_positions]
+        squared = self.squared_norms[pool_positions][:, None] + self.squared_norms[None, :] - 2 * targets @ self.vectors.T
+        return np.sqrt(np.clip(squared, 0, None)).astype('float64')
+
+
+class SimilarityIndex:
+    """
+    Per-position nearest-neighbour indexes for one provider's frame, built on first use
+    of each position and kept for the life of the data version.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.metrics_per_position = metrics_per_position_by_api.get(query.api, {})
+        self.positions = {}
+
+    def position_index(self, position):
+        # Keyed by the position as offered in the UI: aliases share the stored rows but
+        # each has its own metrics
+        if position not in self.positions:
+            if position not in self.metrics_per_position:
+                raise ValueError(f"No metrics defined for position '{position}'.")
+            index = PositionSimilarityIndex(self.query, position, self.metrics_per_position[position])
+            if not index.metrics:
+                raise ValueError(f"None of the metrics for position '{position}' are in the data.")
+            self.positions[position] = index
+        return self.positions[position]
+
+    def target_position(self, index, player_name, league='All', season=''):
+        rows = self.query.player_positions(player_name, league, season, index.position)
+        if len(rows) == 0:
+            raise ValueError(f"Player {player_name} not found.")
+        # The pool is in frame order, so the row's place in it is a binary search away
+        return np.searchsorted(index.rows, rows[0])
+
+    def allowed_mask(self, index, leagues=None, seasons=None, max_age=None, min_minutes=None):
+        if not leagues and not seasons and max_age is None and min_minutes is None:
+            return None
+        pool = self.query.df.iloc[index.rows]
+        allowed = np.ones(len(pool), dtype=bool)
+        if leagues:
+            allowed &= pool['League'].isin(leagues).to_numpy()
+        if seasons:
+            allowed &= pool['Season'].isin(seasons).to_numpy()
+        if max_age is not None:
+            allowed &= (pool['Age'] < max_age).to_numpy()
+        if min_minutes is not None:
+            allowed &= (pool['Minutes'] >= min_minutes).to_numpy()
+        return allowed
+
+    def similar_players(self, player_name, position, league='All', season='', k=10, radius=None,
+                        leagues=None, seasons=None, max_age=None, min_minutes=None, mode='auto'):
+        """
+        Most similar player-seasons to a player across every league and season.
+
+        Parameters:
+            player_name (str): Player to compare against.
+            position (str): Playing position, as offered in the UI.
+            league, season (str): Which of the player's seasons to use ('All' / '' for the first found).
+            k (int): Number of players to return, ignored when radius is given.
+            radius (float): Return every player within this distance instead of the top k.
+            leagues, seasons (list): Only consider players from these leagues / seasons.
+            max_age (int): Only consider players younger than this.
+            min_minutes (int): Only consider players with at least these minutes.
+            mode (str): 'exact', 'approximate' or 'auto' (exact for pools up to exact_pool_size).
+
+        Returns:
+            pd.DataFrame: The players, closest first, with their distance and a 0-100
+            similarity score. The target player's own seasons are left out.
+        """
+        index = self.position_index(position)
+        target = self.target_position(index, player_name, league, season)
+        allowed = self.allowed_mask(index, leagues, seasons, max_age, min_minutes)
+
+        # Over-fetch so dropping the player's own seasons still leaves k results
+        own_seasons = len(self.query.player_index.get(player_name, []))
+        positions, distances = index.search(target, k=None if radius is not None else k + own_seasons,
+                                            radius=radius, allowed=allowed, mode=mode)
+
+        result = self.neighbour_frame(index, positions, distances)
+        result = result[result['Player Name'] != player_name]
+        if radius is None:
+            result = result.head(k)
+        return result.reset_index(drop=True)
+
+    def similar_players_batch(self, targets, k=10, leagues=None, seasons=None, max_age=None, min_minutes=None):
+        """
+        Most similar player-seasons for a whole list of players, e.g. a squad or a
+        shortlist, with one distance matrix per position instead of one search per player.
+
+        Parameters:
+            targets (pd.DataFrame): One row per player with 'Player Name' and 'Position', and
+                optionally 'League' and 'Season' to pick which of the player's seasons to use.
+            k (int): Number of similar players per target.
+            leagues, seasons, max_age, min_minutes: As in similar_players.
+
+        Returns:
+            (pd.DataFrame, list): The combined lists, in target order and closest first,
+            with the target's name, position and each player's rank, and the
+            (player name, reason) pairs of the targets that couldn't be searched.
+        """
+        results = []
+        skipped = []
+        targets = targets.reset_index(drop=True)
+
+        for position, group in targets.groupby('Position', sort=False, observed=True):
+            try:
+                index = self.position_index(position)
+            except ValueError as e:
+                skipped += [(name, str(e)) for name in group['Player Name']]
+                continue
+
+            target_positions, target_orders = [], []
+            for order, target in group.iterrows():
+                try:
+                    target_positions.append(self.target_position(
+                        index, target['Player Name'], target.get('League', 'All'), target.get('Season', '')
+                    ))
+                    target_orders.append(order)
+                except ValueError as e:
+                    skipped.append((target['Player Name'], str(e)))
+            if not target_positions:
+                continue
+
+            distances = index.distance_matrix(np.array(target_positions))
+            allowed = self.allowed_mask(index, leagues, seasons, max_age, min_minutes)
+            if allowed is not None:
+                distances[:, ~allowed] = np.inf
+            # Leave out each target's own seasons
+            names = index.query.player_names[index.rows]
+            for i, order in enumerate(target_orders):
+                distances[i, names == targets.at[order, 'Player Name']] = np.inf
+
+            n = min(k, distances.shape[1])
+            if n == 0:
+                continue
+            nearest = np.argpartition(distances, n - 1, axis=1)[:, :n]
+            nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+            order_within = np.argsort(nearest_distances, axis=1, kind='stable')
+            nearest = np.take_along_axis(nearest, order_within, axis=1)
+            nearest_distances = np.take_along_axis(nearest_distances, order_within, axis=1)
+
+            for i, order in enumerate(target_orders):
+                keep = np.isfinite(nearest_distances[i])
+                result = self.neighbour_frame(index, nearest[i][keep], nearest_distances[i][keep])
+                result.insert(0, 'Rank', np.arange(1, len(result) + 1))
+                result.insert(0, 'Target Position', position)
+                result.insert(0, 'Target', targets.at[order, 'Player Name'])
+                result['target_order'] = order
+                results.append(result)
+
+        if not results:
+            return pd.DataFrame(columns=['Target', 'Target Position', 'Rank'] + result_columns + ['Distance', 'Similarity']), skipped
+        combined = pd.concat(results, ignore_index=True)
+        combined = combined.sort_values(['target_order', 'Rank'], kind='stable').drop(columns='target_order')
+        return combined.reset_index(drop=True), skipped
+
+    def neighbour_frame(self, index, positions, distances):
+        result = self.query.df.iloc[index.rows[positions]][result_columns].reset_index(drop=True)
+        result['Distance'] = distances.round(3)
+        result['Similarity'] = (100 / (1 + distances)).round(1)
+        return result
+
+
+def get_similarity_index(df, api='statbomb'):
+    """
+    Returns the similarity index for df, built once per data version.
+    """
+    return get_derived(df, api, 'similarity_index', SimilarityIndex)
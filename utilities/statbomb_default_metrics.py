@@ -169,7 +169,7 @@ profiles_zcore = {
             "Profile Name": "Defensive Full Back",
             "Using Metrics": [
             "Dribbles Stopped %",
-            "OP Passes into Box",
+            "OP Passes Into Box",
             "Successful Dribbles",
             "PADJ Tackles",
             "Aerial Win %"
@@ -184,7 +184,7 @@ profiles_zcore = {
             "Using Metrics": [
             "Dribbles Stopped %",
             "DA OBV",
-            "OP Passes into Box",
+            "OP Passes Into Box",
             "Successful Dribbles",
             "Ball Recoveries",
             "PADJ Tackles",
@@ -210,7 +210,7 @@ profiles_zcore = {
             "Carries",
             "PINTIN",
             ],
-            "Weighted Metrics": ["OBV D&C", "OP Passes into Box", "Successful Crosses", "Carries"],
+            "Weighted Metrics": ["OBV D&C", "OP Passes Into Box", "Successful Crosses", "Carries"],
             "Z Score Name": "Direct Winger Score"
         },
         {
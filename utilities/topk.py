@@ -0,0 +1,58 @@
+import numpy as np
+
+
+def top_k(values, k, ascending=False):
+    """
+    Positions of the k best values, best first, without sorting the rest.
+
+    np.argpartition finds the k best in linear time and only those are sorted. Ties
+    keep their original order and missing values come last, exactly like a stable
+    sort_values(ascending=ascending).head(k).
+    """
+    values = np.asarray(values, dtype='float64')
+    k = min(k, len(values))
+    if k <= 0:
+        return np.array([], dtype=np.intp)
+
+    # Smaller key is better, missing values get the worst key
+    keys = values if ascending else -values
+    keys = np.where(np.isnan(keys), np.inf, keys)
+
+    if k < len(keys):
+        threshold = keys[np.argpartition(keys, k - 1)[k - 1]]
+        better = np.flatnonzero(keys < threshold)
+        tied = np.flatnonzero(keys == threshold)[:k - len(better)]
+        candidates = np.concatenate([better, tied])
+    else:
+        candidates = np.arange(len(keys))
+
+    return candidates[np.lexsort((candidates, keys[candidates]))]
+
+
+def grouped_top_k(values, groups, k, ascending=False):
+    """
+    Positions of the k best values within every group, in one call.
+
+    groups holds a group code per value (e.g. from DataFrame.groupby(...).ngroup()).
+    Values are split into their groups by one stable sort on the group code alone, and
+    each group's k best are then picked with top_k, so only those are sorted. Returns
+    (positions, rank within the group), ordered by group and then best first, with the
+    same tie and missing value rules as top_k.
+    """
+    values = np.asarray(values, dtype='float64')
+    groups = np.asarray(groups)
+    if len(values) == 0 or k <= 0:
+        return np.array([], dtype=np.intp), np.array([], dtype=np.intp)
+
+    # Members of a group stay in their original order, which top_k breaks ties by
+    by_group = np.argsort(groups, kind='stable')
+    sorted_groups = groups[by_group]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    ends = np.r_[starts[1:], len(by_group)]
+
+    positions = []
+    for start, end in zip(starts, ends):
+        members = by_group[start:end]
+        positions.append(members[top_k(values[members], k, ascending)])
+    ranks = [np.arange(1, len(best) + 1) for best in positions]
+    return np.concatenate(positions), np.concatenate(ranks)
@@ -3,6 +3,12 @@ import matplotlib.font_manager as fm
 import numpy as np
 from .statbomb_default_metrics import metrics_per_position
 from .wyscout_default_metrics import metrics_per_position as metrics_per_position_1
+from .query import get_player_season_query, resolve_position
+from .options import get_page_options
+from .percentiles import get_percentile_cube
+from .similarity_index import get_similarity_index
+from .zscore_engine import get_zscore_engine
+from .topk import top_k, grouped_top_k
 
 custom_fontt = fm.FontProperties(fname="fonts/Alexandria-Regular.ttf")
 
@@ -13,12 +19,8 @@ def get_metrics_by_position(position, api='statbomb'):
     elif api=='wyscout':
         return metrics_per_position_1[position]
 
-def get_players_by_position(df, league, season, position):
-    if league not in ['All', '']:
-        df = df[df['League'] == league]    
-    if season!='':  
-        df = df[df['Season'] == season]    
-    return df[df['Position'] == position]['Player Name'].tolist()
+def get_players_by_position(df, league, season, position, api='statbomb'):
+    return get_page_options(df, api).players(league, season, position)
 
 def get_player_metrics_percentile_ranks(df, player_name, position, all_metric):
     position_specific_data = df[df['Position'] == position]
@@ -91,72 +93,73 @@ def get_stat_values(all_metrics, player_metrics_df, positional_means_df):
             
     return stat1, stat2
 
-def get_weighted_score(league_name):
-    league_rankings = {
-        "Premier League": 0.95,
-        "Spain 1": 0.9,
-        "Italy 1": 0.89,
-        "Germany 1": 0.89,
-        "France 1": 0.87,
-        "Netherlands 1": 0.80,
-        "Portugal 1": 0.83,
-        "Belgium 1": 0.82,
-        "Championship": 0.80,
-        "Major League Soccer": 0.79,
-        "Japan 1": 0.78,
-        "Turkey 1": 0.78,
-        "Norway 1": 0.75,
-        "Denmark 1": 0.77,
-        "Bundesliga": 0.77,
-        "Italy 2": 0.76,
-        "Croatia 1": 0.76,
-        "Premiership": 0.73,
-        "Poland 1": 0.76,
-        "Allsvenskan": 0.75,
-        "NB I": 0.75,
-        "Czech 1": 0.75,
-        "Germany 2": 0.75,
-        "Greece 1": 0.75,
-        "Romania 1": 0.75,
-        "Spain 2": 0.75,
-        "K League 1": 0.74,
-        "Swiss 1": 0.75,
-        "Serbia 1": 0.73,
-        "France 2": 0.73,
-        "League One": 0.73,
-        "Slovakia 1": 0.70,
-        "Bulgaria 1": 0.70,
-        "1. SNL": 0.69,
-        "Belgium 2": 0.69,
-        "Portugal 2": 0.69,
-        "Netherlands 2": 0.69,
-        "A-League": 0.67,
-        "Germany 3": 0.68,
-        "France 3": 0.68,
-        "Japan 2": 0.65,
-        "Iceland 1": 0.52,
-        "Veikkausliiga": 0.63,
-        "Latvia 1": 0.64,
-        "Norway 2": 0.62,
-        "Sweden 2": 0.62,
-        "Swizz 2": 0.63,
-        "Moldova 1": 0.60,
-        "K League 2": 0.59,
-        "League Two": 0.64,
-        "Austria 2": 0.63,
-        "Denmark 2": 0.58,
-        "Scotland 2": 0.55,
-        "Canada 1": 0.59,
-        "Hungary 2": 0.60,
-        "Ireland 1": 0.52,
-        "Germany 4": 0.57,
-        "Turkey 2": 0.56,
-        "National League": 0.52,
-        "Wales 1": 0.42,
-        "NIreland1": 0.43,
-        "Ireland 2": 0.41,
-        "Premier League 2 Division One": 0.41,
-        "VNL 2": 0.40
-    }
+# League strength coefficients used to weight overall scores across leagues
+league_rankings = {
+    "Premier League": 0.95,
+    "Spain 1": 0.9,
+    "Italy 1": 0.89,
+    "Germany 1": 0.89,
+    "France 1": 0.87,
+    "Netherlands 1": 0.80,
+    "Portugal 1": 0.83,
+    "Belgium 1": 0.82,
+    "Championship": 0.80,
+    "Major League Soccer": 0.79,
+    "Japan 1": 0.78,
+    "Turkey 1": 0.78,
+    "Norway 1": 0.75,
+    "Denmark 1": 0.77,
+    "Bundesliga": 0.77,
+    "Italy 2": 0.76,
+    "Croatia 1": 0.76,
+    "Premiership": 0.73,
+    "Poland 1": 0.76,
+    "Allsvenskan": 0.75,
+    "NB I": 0.75,
+    "Czech 1": 0.75,
+    "Germany 2": 0.75,
+    "Greece 1": 0.75,
+    "Romania 1": 0.75,
+    "Spain 2": 0.75,
+    "K League 1": 0.74,
+    "Swiss 1": 0.75,
+    "Serbia 1": 0.73,
+    "France 2": 0.73,
+    "League One": 0.73,
+    "Slovakia 1": 0.70,
+    "Bulgaria 1": 0.70,
+    "1. SNL": 0.69,
+    "Belgium 2": 0.69,
+    "Portugal 2": 0.69,
+    "Netherlands 2": 0.69,
+    "A-League": 0.67,
+    "Germany 3": 0.68,
+    "France 3": 0.68,
+    "Japan 2": 0.65,
+    "Iceland 1": 0.52,
+    "Veikkausliiga": 0.63,
+    "Latvia 1": 0.64,
+    "Norway 2": 0.62,
+    "Sweden 2": 0.62,
+    "Swizz 2": 0.63,
+    "Moldova 1": 0.60,
+    "K League 2": 0.59,
+    "League Two": 0.64,
+    "Austria 2": 0.63,
+    "Denmark 2": 0.58,
+    "Scotland 2": 0.55,
+    "Canada 1": 0.59,
+    "Hungary 2": 0.60,
+    "Ireland 1": 0.52,
+    "Germany 4": 0.57,
+    "Turkey 2": 0.56,
+    "National League": 0.52,
+    "Wales 1": 0.42,
+    "NIreland1": 0.43,
+    "Ireland 2": 0.41,
+    "Premier League 2 Division One": 0.41,
+    "VNL 2": 0.40
+}
 
+def get_weighted_score(league_name):
     return league_rankings[league_name]
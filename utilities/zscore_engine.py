@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+from .statbomb_default_metrics import profiles_zcore as statbomb_profiles
+from .wyscout_default_metrics import profiles_zcore as wyscout_profiles
+from .query import get_derived
+from .topk import top_k
+
+profiles_by_api = {
+    'statbomb': statbomb_profiles,
+    'wyscout': wyscout_profiles,
+}
+
+# Weight of a metric's z-score in a profile score
+weighted_metric_weight = 2
+using_metric_weight = 1
+
+_compiled_profiles = {}
+
+
+class CompiledProfiles:
+    """
+    Every z-score profile of one position as a (metrics x profiles) weight matrix,
+    2 for a weighted metric, 1 for any other metric the profile uses and 0 otherwise,
+    so the scores of every profile are one matrix product of the metric z-scores.
+    """
+
+    def __init__(self, profiles):
+        self.profiles = profiles
+        self.names = [profile["Profile Name"] for profile in profiles]
+        self.score_names = {profile["Profile Name"]: profile["Z Score Name"] for profile in profiles}
+        self.metrics = list(dict.fromkeys(
+            metric for profile in profiles for metric in profile["Using Metrics"] + profile["Weighted Metrics"]
+        ))
+        metric_index = {metric: i for i, metric in enumerate(self.metrics)}
+
+        self.weights = np.zeros((len(self.metrics), len(profiles)))
+        for j, profile in enumerate(profiles):
+            for metric in profile["Using Metrics"]:
+                self.weights[metric_index[metric], j] = using_metric_weight
+            for metric in profile["Weighted Metrics"]:
+                self.weights[metric_index[metric], j] = weighted_metric_weight
+
+    def profile(self, profile_name):
+        if profile_name not in self.score_names:
+            return None
+        return self.profiles[self.names.index(profile_name)]
+
+
+def get_compiled_profiles(position, api='statbomb'):
+    """
+    Returns the compiled profiles of a position (as offered in the UI), or None when
+    the provider has no profiles for it.
+    """
+    key = (api, position)
+    if key not in _compiled_profiles:
+        profiles = profiles_by_api.get(api, {}).get(position)
+        _compiled_profiles[key] = CompiledProfiles(profiles) if profiles else None
+    return _compiled_profiles[key]
+
+
+class ZScoreEngine:
+    """
+    Profile scores of every player in a peer group for every profile of its position,
+    computed with one z-score pass over the metric matrix and one matrix product, and
+    kept per peer group for the life of the data version.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self._scores = {}
+        self._compiled = {}
+
+    def compiled_profiles(self, position):
+        """
+        The profiles of a position that can be scored from this data, i.e. whose metrics
+        are all columns of the frame, or None when there are none.
+        """
+        if position not in self._compiled:
+            compiled = get_compiled_profiles(position, self.query.api)
+            if compiled is not None and any(metric not in self.query.df.columns for metric in compiled.metrics):
+                available = [profile for profile in compiled.profiles if not self.missing_metrics(profile)]
+                compiled = CompiledProfiles(available) if available else None
+            self._compiled[position] = compiled
+        return self._compiled[position]
+
+    def missing_metrics(self, profile):
+        return [metric for metric in profile["Using Metrics"] + profile["Weighted Metrics"]
+                if metric not in self.query.df.columns]
+
+    def peer_group(self, league, season, position, min_minutes=None):
+        peer = self.query.peer_group(league, season, position)
+        if min_minutes:
+            peer = peer[peer['Minutes'] > min_minutes]
+        return peer
+
+    def scores(self, league, season, position, min_minutes=None):
+        """
+        (players x profiles) frame of profile scores for the peer group, indexed like
+        query.peer_group and with one column per profile that can be scored from the
+        data. With min_minutes only players with more minutes are scored and take part
+        in the z-scores.
+        """
+        key = (league, season, position, min_minutes or None)
+        if key not in self._scores:
+            compiled = self.compiled_profiles(position)
+            if compiled is None:
+                raise ValueError(f"No z-score profiles for position '{position}' can be scored from the data.")
+
+            peer = self.peer_group(league, season, position, min_minutes)
+            values = peer[compiled.metrics].to_numpy(dtype='float64')
+
+            # Missing values take the peer group mean, as before z-scoring one column at a time
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.nanmean(values, axis=0) if len(values) else np.zeros(len(compiled.metrics))
+                values = np.where(np.isnan(values), mean, values)
+                z = (values - mean) / values.std(axis=0)
+            z[~np.isfinite(z)] = np.nan
+
+            # A metric without spread has no z-score, so neither has any profile using it
+            undefined = np.isnan(z).any(axis=0) if len(z) else np.zeros(len(compiled.metrics), dtype=bool)
+            scores = np.nan_to_num(z) @ compiled.weights
+            scores[:, (undefined.astype(float) @ (compiled.weights != 0)) > 0] = np.nan
+
+            self._scores[key] = pd.DataFrame(scores.round(2), index=peer.index, columns=compiled.names)
+        return self._scores[key]
+
+    def top_players(self, league, season, position, profile_name, n=10, min_minutes=None):
+        """
+        The n highest scoring players of the peer group for one profile, with the score
+        in a column named after the profile's Z Score Name.
+        """
+        compiled = get_compiled_profiles(position, self.query.api)
+        profile = compiled.profile(profile_name) if compiled is not None else None
+        if profile is None:
+            raise ValueError(f"Profile '{profile_name}' for position '{position}' not found.")
+        # Only the requested profile's metrics have to be in the data
+        missing = self.missing_metrics(profile)
+        if missing:
+            raise ValueError(f"Metrics of profile '{profile_name}' missing from the data: {', '.join(missing)}")
+
+        scores = self.scores(league, season, position, min_minutes)[profile_name].to_numpy()
+        # Highest first, players without a score last
+        top = top_k(scores, n)
+        players = self.peer_group(league, season, position, min_minutes).iloc[top]
+        players = players[['Player Name', 'Team', 'League', 'Minutes', 'Position', 'Age']].reset_index(drop=True)
+        players[compiled.score_names[profile_name]] = scores[top]
+        return players
+
+
+def get_zscore_engine(df, api='statbomb'):
+    """
+    Returns the z-score engine for df, kept once per data version.
+    """
+    return get_derived(df, api, 'zscore_engine', ZScoreEngine)
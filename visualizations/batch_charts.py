@@ -0,0 +1,311 @@
+"""
+Renders pizza and radar charts for many players at once, e.g. every player of a
+league and position or a shortlist, into a zip of PNG files or one multi-page PDF.
+
+Usage:
+    python -m visualizations.batch_charts wyscout --league "Championship 1" --season 2024/2025 --position Winger --output pack.pdf
+    python -m visualizations.batch_charts statsbomb --shortlist shortlist.csv --charts pizza --output pack.zip
+
+A shortlist is a CSV with 'Player Name', 'League', 'Season' and 'Position' columns.
+Data is read from the snapshot built by data.ingest. Charts are rendered on a pool of
+processes with the Agg backend and served from the chart cache when already rendered.
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+import pandas as pd
+from PIL import Image
+from utilities.chart_cache import get_chart_image
+from utilities.query import get_frame_version, set_data_version
+from utilities.utils import get_player_season_query, resolve_position
+from visualizations.pizza_chart import create_pizza_chart
+from visualizations.radar_chart import create_radar_chart
+
+batch_chart_functions = {
+    'pizza': create_pizza_chart,
+    'radar': create_radar_chart,
+}
+batch_output_formats = ['zip', 'pdf']
+api_by_provider = {'statsbomb': 'statbomb', 'wyscout': 'wyscout'}
+
+# Charts are rendered at 200 dpi and PDF pages are sized in points of 1/72 inch
+chart_dpi = 200
+
+# Dataset of a worker process, sent once when the worker starts rather than with every chart
+_worker_data = {}
+
+
+def chart_params(chart, player_name, league, season, position):
+    # The pizza and radar charts take their parameters in different orders
+    if chart == 'pizza':
+        return (league, season, player_name, position)
+    return (league, player_name, position, season)
+
+
+def league_targets(df, league, season, position, api='statbomb', player_names=None):
+    """
+    One row per player of a league, season and position (as offered in the UI), in
+    the shape render_charts expects, optionally only the players in player_names.
+    """
+    peer = get_player_season_query(df, api).peer_group(league, season, resolve_position(position, api))
+    targets = peer[['Player Name']].drop_duplicates().reset_index(drop=True)
+    if player_names is not None:
+        targets = targets[targets['Player Name'].isin(player_names)].reset_index(drop=True)
+    targets['League'] = league
+    targets['Season'] = season
+    targets['Position'] = position
+    return targets
+
+
+def batch_tasks(targets, charts):
+    return [
+        (chart, target['Player Name'], target.get('League', 'All'), target.get('Season', ''), target['Position'])
+        for _, target in targets.iterrows()
+        for chart in charts
+    ]
+
+
+def worker_data(df, targets):
+    """
+    The part of df the workers need: a chart only looks at its player's league-season,
+    so when every target names one, only those league-seasons are sent, versioned as
+    such (a single league-season as read_partitions and dataset_view version it).
+    """
+    from data.snapshot import get_data_version
+
+    if 'League' not in targets or 'Season' not in targets:
+        return df
+    selected = targets[['League', 'Season']].drop_duplicates()
+    if selected['League'].isin(['All', '']).any() or (selected['Season'] == '').any():
+        return df
+    keys = pd.MultiIndex.from_frame(df[['League', 'Season']].astype(str))
+    subset = df[keys.isin(pd.MultiIndex.from_frame(selected.astype(str)))]
+    data_version = get_frame_version(df)
+    if data_version is not None:
+        if len(selected) == 1:
+            league, season = selected.iloc[0]
+            set_data_version(subset, get_data_version([data_version, league, season, None, None]))
+        else:
+            set_data_version(subset, get_data_version([data_version, sorted(map(tuple, selected.astype(str).values))]))
+    return subset
+
+
+def init_worker(df, api, data_version):
+    matplotlib.use('Agg')
+    # The version is sent apart from the frame, as a token in attrs alone isn't trusted
+    if data_version is not None:
+        set_data_version(df, data_version)
+    _worker_data['df'] = df
+    _worker_data['api'] = api
+
+
+def render_task(task):
+    chart, player_name, league, season, position = task
+    query = get_player_season_query(_worker_data['df'], _worker_data['api'])
+    if len(query.player_positions(player_name, league, season, resolve_position(position, _worker_data['api']))) == 0:
+        return task, None, 'Player not found'
+    try:
+        image = get_chart_image(_worker_data['df'], chart, batch_chart_functions[chart],
+                                *chart_params(chart, player_name, league, season, position), api=_worker_data['api'])
+    except Exception as e:
+        return task, None, str(e)
+    return task, image, None if image is not None else 'Player not found'
+
+
+def png_image_data(png):
+    # The zlib stream of a PNG, its IDAT chunks joined, which a PDF image reads as it is
+    # with the FlateDecode filter and PNG predictors
+    data = []
+    position = 8
+    while position < len(png):
+        length = int.from_bytes(png[position:position + 4], 'big')
+        if png[position + 4:position + 8] == b'IDAT':
+            data.append(png[position + 8:position + 8 + length])
+        position += length + 12
+    return b''.join(data)
+
+
+def render_pdf_task(task):
+    # Pages are encoded in the workers too, so the PDF writer only copies bytes. The
+    # PDF has no alpha here, so the chart is made RGB before it's compressed again.
+    task, image, error = render_task(task)
+    if image is None:
+        return task, None, error
+    page = Image.open(io.BytesIO(image)).convert('RGB')
+    png = io.BytesIO()
+    page.save(png, format='PNG')
+    return task, (page.size, png_image_data(png.getvalue())), None
+
+
+def render_charts(df, targets, charts=('pizza', 'radar'), api='statbomb', max_workers=None, render=render_task):
+    """
+    Yields (task, PNG bytes or None, error or None) for every chart of every target, in
+    target order, where task is (chart, player name, league, season, position).
+    With render=render_pdf_task the image is ((width, height), RGB PNG image data)
+    instead.
+
+    Parameters:
+        df (pd.DataFrame): Player data.
+        targets (pd.DataFrame): One row per player with 'Player Name' and 'Position', and
+            optionally 'League' and 'Season'.
+        charts (list): Any of 'pizza' and 'radar'.
+        api (str): Data provider.
+        max_workers (int): Worker processes, every core by default.
+    """
+    tasks = batch_tasks(targets, charts)
+    if not tasks:
+        return
+    workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    # Workers are started fresh rather than forked, so they don't inherit the threads
+    # and locks of a running Streamlit server
+    data = worker_data(df, targets)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=init_worker, initargs=(data, api, get_frame_version(data))) as executor:
+        chunksize = max(1, len(tasks) // (workers * 4))
+        yield from executor.map(render, tasks, chunksize=chunksize)
+
+
+def chart_file_name(number, task):
+    chart, player_name, league, season, position = task
+    name = f"{number:03d} {player_name} {chart}".translate(str.maketrans('/\\:*?"<>|', '---------'))
+    return f"{name}.png"
+
+
+def write_charts_zip(path, results, progress=None):
+    errors = []
+    with zipfile.ZipFile(path, 'w') as archive:
+        for number, (task, image, error) in enumerate(results, start=1):
+            if image is not None:
+                # PNG is already compressed, so the files are stored as they are
+                archive.writestr(chart_file_name(number, task), image)
+            else:
+                errors.append((task, error))
+            if progress is not None:
+                progress(task)
+    return errors
+
+
+def write_charts_pdf(path, results, progress=None):
+    """
+    Writes the pages from render_charts(..., render=render_pdf_task) into a PDF at path,
+    one page per chart, as they arrive. Each page's PNG image data is embedded as it is
+    (the PDF FlateDecode filter with PNG predictors), so pages are lossless and nothing
+    is decoded or held in memory beyond the current page.
+    """
+    errors = []
+    offsets = {}
+    page_ids = []
+
+    with open(path, 'wb') as f:
+        def write_object(object_id, body, stream=None):
+            offsets[object_id] = f.tell()
+            f.write(f"{object_id} 0 obj\n".encode() + body)
+            if stream is not None:
+                f.write(b"\nstream\n" + stream + b"\nendstream")
+            f.write(b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        # Object 2, the page tree, is written last once every page is known
+        next_id = 3
+        for task, page, error in results:
+            if page is not None:
+                (width, height), image_data = page
+                image_id, contents_id, page_id = next_id, next_id + 1, next_id + 2
+                next_id += 3
+                points = (width * 72 / chart_dpi, height * 72 / chart_dpi)
+                write_object(image_id, (
+                    f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceRGB "
+                    f"/BitsPerComponent 8 /Filter /FlateDecode "
+                    f"/DecodeParms << /Predictor 15 /Colors 3 /BitsPerComponent 8 /Columns {width} >> "
+                    f"/Length {len(image_data)} >>"
+                ).encode(), image_data)
+                contents = f"q {points[0]:.2f} 0 0 {points[1]:.2f} 0 0 cm /Chart Do Q".encode()
+                write_object(contents_id, f"<< /Length {len(contents)} >>".encode(), contents)
+                write_object(page_id, (
+                    f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {points[0]:.2f} {points[1]:.2f}] "
+                    f"/Resources << /XObject << /Chart {image_id} 0 R >> >> /Contents {contents_id} 0 R >>"
+                ).encode())
+                page_ids.append(page_id)
+            else:
+                errors.append((task, error))
+            if progress is not None:
+                progress(task)
+
+        kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids)
+        write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode())
+
+        xref_offset = f.tell()
+        f.write(f"xref\n0 {next_id}\n0000000000 65535 f \n".encode())
+        for object_id in range(1, next_id):
+            f.write(f"{offsets[object_id]:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {next_id} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+    return errors
+
+
+def batch_render(df, targets, path, charts=('pizza', 'radar'), output_format='zip', api='statbomb',
+                 max_workers=None, progress=None):
+    """
+    Renders charts for every target into a zip of PNG files or a multi-page PDF at path.
+    Charts are written as they come back from the workers, so memory use doesn't grow
+    with the number of players. progress is called with each task as it is written.
+
+    Returns:
+        list: (task, reason) of the charts that couldn't be rendered.
+    """
+    if output_format not in batch_output_formats:
+        raise ValueError(f"Unknown output format '{output_format}', expected zip or pdf")
+    unknown = [chart for chart in charts if chart not in batch_chart_functions]
+    if unknown:
+        raise ValueError(f"Unknown charts: {', '.join(unknown)}")
+
+    if output_format == 'zip':
+        return write_charts_zip(path, render_charts(df, targets, charts, api, max_workers), progress)
+    return write_charts_pdf(path, render_charts(df, targets, charts, api, max_workers, render_pdf_task), progress)
+
+
+def main(argv=None):
+    from data.snapshot import read_partitions
+
+    parser = argparse.ArgumentParser(description="Render pizza and radar charts for many players at once.")
+    parser.add_argument('provider', choices=list(api_by_provider))
+    parser.add_argument('--league')
+    parser.add_argument('--season')
+    parser.add_argument('--position')
+    parser.add_argument('--shortlist', help="CSV with Player Name, League, Season and Position columns")
+    parser.add_argument('--charts', nargs='+', choices=list(batch_chart_functions), default=list(batch_chart_functions))
+    parser.add_argument('--output', required=True, help="a .zip or .pdf file")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    api = api_by_provider[args.provider]
+    output_format = 'pdf' if args.output.lower().endswith('.pdf') else 'zip'
+    if args.shortlist:
+        targets = pd.read_csv(args.shortlist)
+        df = read_partitions(args.provider)
+    elif args.league and args.season and args.position:
+        df = read_partitions(args.provider, args.league, args.season)
+        targets = None
+    else:
+        parser.error("pass --shortlist, or --league, --season and --position")
+    if df is None:
+        parser.error(f"no {args.provider} snapshot found, build it with python -m data.ingest {args.provider}")
+    if targets is None:
+        targets = league_targets(df, args.league, args.season, args.position, api)
+
+    start = time.time()
+    errors = batch_render(df, targets, args.output, args.charts, output_format, api, args.workers)
+    for (chart, player_name, league, season, position), error in errors:
+        print(f"Skipped {chart} for {player_name}: {error}")
+    print(f"{len(targets) * len(args.charts) - len(errors)} charts -> {args.output} in {time.time() - start:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
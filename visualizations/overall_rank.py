@@ -1,40 +1,83 @@
 
 import pandas as pd
-from utilities.utils import get_metrics_by_position
+import numpy as np
+from utilities.utils import get_metrics_by_position, get_player_season_query, get_percentile_cube
+from utilities.utils import grouped_top_k, top_k
 
-def get_overall_rank(data, league_name, season, position, api):
+def get_overall_rank(data, league_name, season, position, api, top_n=None):
     """
     This function calculates the percentile rank for each metric column and then averages these percentiles
     to compute the overall score for each player, rounding to two decimal places.
+    With top_n only the best top_n players are selected and sorted.
     """
     all_numeric_metrics = get_metrics_by_position(position, api)
-    if position == 'Number 6' and api=='statbomb':
-        position = 'Number 8'
-
-    if (position == 'Number 8' or position == 'Number 10') and api=='wyscout':
-        position = 'Number 6'
-
-    if league_name not in ['All', '']:
-        data = data[data['League'] == league_name]    
-    data = data[data['Position']==position]
-    if season!='':
-        data = data[data['Season']==season]
+    percentiles = get_percentile_cube(data, api).peer_percentiles(league_name, season, position, all_numeric_metrics)
+    data = get_player_season_query(data, api).peer_group(league_name, season, position).copy()
     data['Age'] = data['Age'].fillna(0)  # Replace NaN with 0
     data['Age'] = data['Age'].replace([float('inf'), -float('inf')], 0)
     data['Age'] = data['Age'].astype(int)
 
-    for metric in all_numeric_metrics:
-        # Calculate the percentile rank for each metric and round to 2 decimal places
-        data[f'{metric}_percentile'] = (data[metric].rank(pct=True) * 100).round(0)
-
-    # Calculate the average of all metric percentiles to get the overall score, rounded to 2 decimal places
-    data['Overall Score'] = data[[f'{metric}_percentile' for metric in all_numeric_metrics]].mean(axis=1)
+    # Average of the player's whole-number percentiles in every position metric
+    data['Overall Score'] = percentiles.mean(axis=1)
 
-    data = data.sort_values(by='Overall Score', ascending=False)
+    if top_n is None:
+        data = data.sort_values(by='Overall Score', ascending=False)
+    else:
+        data = data.iloc[top_k(data['Overall Score'], top_n)]
     data["Overall Score"] = data["Overall Score"].astype(int)
 
     return data[['Player Name', 'Team', 'Age', 'Minutes', 'Overall Score']]
 
+def get_leaderboard(data, season, positions=None, k=10, api='statbomb'):
+    """
+    Top k players by overall score in every league and position of a season ('' for
+    every season), from one cube lookup and one grouped top-k per position rather than
+    an overall rank and a sort per league.
+
+    Parameters:
+        data (pd.DataFrame): DataFrame containing player data with metrics.
+        season (str): Season to rank, '' for every season.
+        positions (list): Positions to include, every position with metrics when empty.
+        k (int): Players per league and position.
+
+    Returns:
+        pd.DataFrame: League, Position and Rank followed by the overall rank columns.
+    """
+    query = get_player_season_query(data, api)
+    cube = get_percentile_cube(data, api)
+    # Players are ranked against their own league, and season unless every season is ranked
+    keys = ('League', 'Season', 'Position') if season != '' else ('League', 'Position')
+    positions = positions or sorted(data['Position'].astype(str).unique())
+
+    leaderboards = []
+    for position in positions:
+        metrics = get_metrics_by_position(position, api) if position in cube.metrics_per_position else None
+        if not metrics or any(metric not in cube.metric_index for metric in metrics):
+            continue
+        rows = query.rows('All', season, position)
+        if len(rows) == 0:
+            continue
+
+        with np.errstate(all='ignore'):
+            scores = np.nanmean(cube.take(rows, keys, metrics), axis=1)
+        # Players without a percentile in any metric have no score to rank by
+        scored = np.isfinite(scores)
+        rows, scores = rows[scored], scores[scored]
+        if len(rows) == 0:
+            continue
+        leagues = data['League'].to_numpy()[rows]
+        _, groups = np.unique(leagues.astype(str), return_inverse=True)
+        top, rank = grouped_top_k(scores, groups, k)
+
+        leaderboard = data.iloc[rows[top]][['League', 'Position', 'Player Name', 'Team', 'Age', 'Minutes']].reset_index(drop=True)
+        leaderboard.insert(2, 'Rank', rank)
+        leaderboard['Overall Score'] = scores[top].astype(int)
+        leaderboards.append(leaderboard)
+
+    if not leaderboards:
+        return pd.DataFrame(columns=['League', 'Position', 'Rank', 'Player Name', 'Team', 'Age', 'Minutes', 'Overall Score'])
+    return pd.concat(leaderboards, ignore_index=True).sort_values(['League', 'Position', 'Rank'], kind='stable').reset_index(drop=True)
+
 def create_rank_visualization(data, league_name,season, position, api='statbomb'):
     """
     Create an interactive horizontal bar visualization of the rank percentage.
@@ -45,6 +88,12 @@ def create_rank_visualization(data, league_name,season, position, api='statbomb'
     Returns:
     fig: Plotly figure object.
     """
+    return style_overall_rank(get_overall_rank(data, league_name, season, position, api))
+
+def style_overall_rank(overall_rank_df):
+    """
+    The overall rank table numbered from 1, with the Overall Score coloured by band.
+    """
     def color_overall_score(row):
         overall_score = row['Overall Score']
         if overall_score < 50 :
@@ -54,7 +103,7 @@ def create_rank_visualization(data, league_name,season, position, api='statbomb'
         else:
             return ['background-color: green']  # 75% and above
 
-    overall_rank_df = get_overall_rank(data, league_name, season, position, api)
+    overall_rank_df = overall_rank_df.copy()
     overall_rank_df['Overall Score'] = pd.to_numeric(overall_rank_df['Overall Score'], errors='coerce')
     # overall_rank_df['Overall Score'] = overall_rank_df['Overall Score'].apply(lambda x: x)
     overall_rank_df = overall_rank_df.reset_index()
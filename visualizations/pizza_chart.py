@@ -1,50 +1,57 @@
-import streamlit as st
 from mplsoccer import PyPizza
 from matplotlib.patches import Patch,Circle
 import matplotlib.pyplot as plt
 from utilities.utils import get_metrics_by_position
-from utilities.utils import get_player_metrics_percentile_ranks
 from utilities.utils import custom_fontt
+from utilities.utils import get_player_season_query, get_percentile_cube, resolve_position
 
 
-def create_pizza_chart(complete_data,league_name,season, player_name, position, api="statbomb"):
+def pizza_chart_values(complete_data, league_name, season, player_name, position, api="statbomb"):
+    """
+    What the pizza chart shows for a player: (metrics, percentiles, player name, team,
+    minutes, age). Raises ValueError when the player isn't found.
+    """
 
     position_specific_metric = get_metrics_by_position(position, api)
+    position = resolve_position(position, api)
 
-    if position == 'Number 6' and api=='statbomb':
-        position = 'Number 8'
-
-    if (position == 'Number 8' or position == 'Number 10') and api=='wyscout':
-        position = 'Number 6'
-
-
-    if league_name not in ['All', '']:
-        complete_data = complete_data[complete_data['League'] == league_name]    
-    if season!='':
-        complete_data = complete_data[complete_data['Season']==season]
-
-    player_df_before = complete_data[complete_data['Player Name'] == player_name]    
+    player_df_before = get_player_season_query(complete_data, api).player_rows(player_name, league_name, season)
 
-    player_df = get_player_metrics_percentile_ranks(complete_data, player_name, position, position_specific_metric)
+    cube = get_percentile_cube(complete_data, api)
+    player_df = cube.player_percentiles(player_name, league_name, season, position, position_specific_metric)
     if player_df is None or player_df.empty:
-        st.error(f'Player {player_name} not found.')
-        return None
+        raise ValueError(f'Player {player_name} not found.')
 
     available_metrics = position_specific_metric
     metric_values = player_df[available_metrics].iloc[0].values.tolist()
     # Ensure that metrics and values match
     if len(available_metrics) != len(metric_values):
-        st.error("Metric mismatch error.")
-        return None
-
-    slice_colors = []
-    for metric in metric_values:
-        if metric >=70:
-            slice_colors.append("#58AC4E")
-        elif metric >=50:
-            slice_colors.append("#1A78CF")
-        else:
-            slice_colors.append("#aa42af")
+        raise ValueError("Metric mismatch error.")
+
+    # Convert 'Minutes Played' to an integer to remove decimals
+    minutes, age = int(player_df_before['Minutes'].iloc[0]), int(player_df_before['Age'].iloc[0])
+    return available_metrics, metric_values, player_name, str(player_df.iloc[0]['Team']), minutes, age
+
+
+def create_pizza_chart(complete_data,league_name,season, player_name, position, api="statbomb"):
+    return draw_pizza_chart(*pizza_chart_values(complete_data, league_name, season, player_name, position, api), api=api)
+
+
+def pizza_slice_color(value):
+    if value >=70:
+        return "#58AC4E"
+    elif value >=50:
+        return "#1A78CF"
+    else:
+        return "#aa42af"
+
+
+def draw_pizza_chart(available_metrics, metric_values, player_name, team, minutes, age, api="statbomb"):
+    """
+    Draws the pizza chart of one player from its percentiles. The artists that change
+    from player to player are tagged with a gid, see visualizations.svg_charts.
+    """
+    slice_colors = [pizza_slice_color(metric) for metric in metric_values]
  
     baker = PyPizza(
         params=available_metrics,                  # list of parameters
@@ -73,15 +80,22 @@ def create_pizza_chart(complete_data,league_name,season, player_name, position,
         kwargs_values=dict(color="#F2F2F2", fontsize=0, alpha=0, fontproperties=custom_fontt, zorder=-5)
     )
 
+    main_slices, blank_slices = ax.containers[0], ax.containers[1]
+    for i, (main_slice, blank_slice) in enumerate(zip(main_slices, blank_slices)):
+        main_slice.set_gid(f'slice-{i}')
+        blank_slice.set_gid(f'blank-{i}')
+    for i, value_text in enumerate(baker.get_value_texts()):
+        value_text.set_gid(f'value-{i}')
+
     fig.text(
         0.08, 0.94, f"{player_name}", size=25,
-        ha="left", fontproperties=custom_fontt, color="#F2F2F2"
+        ha="left", fontproperties=custom_fontt, color="#F2F2F2", gid='player-name'
     )
 
     fig.text(
-        0.08, 0.92, f"Club: {str(player_df.iloc[0]['Team'])}", 
+        0.08, 0.92, f"Club: {team}", 
         size=10,
-        ha="left", fontproperties=custom_fontt, color="#F2F2F2", alpha=0.8
+        ha="left", fontproperties=custom_fontt, color="#F2F2F2", alpha=0.8, gid='club'
     )
 
     fig.text(
@@ -91,13 +105,11 @@ def create_pizza_chart(complete_data,league_name,season, player_name, position,
         ha="left", fontproperties=custom_fontt, color="#F2F2F2", alpha=0.8
     )
 
-    # Convert 'Minutes Played' to an integer to remove decimals
-
     fig.text(
         0.08, 0.88,
-        f"Minutes Played: {int(player_df_before['Minutes'])}  |  Age: {int(player_df_before['Age'])}",
+        f"Minutes Played: {minutes}  |  Age: {age}",
         size=10,
-        ha="left", fontproperties=custom_fontt, color="#F2F2F2", alpha=0.8
+        ha="left", fontproperties=custom_fontt, color="#F2F2F2", alpha=0.8, gid='minutes'
     )
 
     colors_list = ["#58AC4E", "#1A78CF", "#aa42af"]
@@ -2,30 +2,65 @@ import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.patches import Patch
 from utilities.utils import get_metrics_by_position
-from utilities.utils import get_player_and_avg_metrics, get_stat_values
+from utilities.utils import get_stat_values
 from utilities.utils import custom_fontt
+from utilities.utils import get_player_season_query, get_percentile_cube, resolve_position
 
 
-def create_radar_chart(complete_data, league_name,player_name, position, season, api='statbomb'):
+def radar_chart_values(complete_data, league_name, player_name, position, season, api='statbomb'):
+    """
+    What the radar chart shows for a player: (metrics, player percentiles, average
+    percentiles, player name, team, minutes, league name, position). Raises ValueError
+    when the player isn't found.
+    """
 
     all_metrics = get_metrics_by_position(position, api)
+    position = resolve_position(position, api)
 
-    if position == 'Number 6' and api=='statbomb':
-        position = 'Number 8'
+    player_data = get_player_season_query(complete_data, api).player_rows(player_name, league_name, season)
 
-    if (position == 'Number 8' or position == 'Number 10') and api=='wyscout':
-        position = 'Number 6'
+    cube = get_percentile_cube(complete_data, api)
+    player_metrics_df = cube.player_percentiles(player_name, league_name, season, position, all_metrics)
+    if player_metrics_df is None or player_metrics_df.empty:
+        raise ValueError(f'Player {player_name} not found.')
+    positional_means_df = cube.average_percentiles(league_name, season, position, all_metrics)
+    stats1, stats2 = get_stat_values(all_metrics, player_metrics_df, positional_means_df)
 
-    if league_name not in ['All', '']:
-        complete_data = complete_data[complete_data['League'] == league_name]    
-    if season!='':
-        complete_data = complete_data[complete_data['Season']==season]
+    team, minutes = player_data.iloc[0]['Team'], int(player_data.iloc[0]['Minutes'])
+    return all_metrics, stats1, stats2, player_name, team, minutes, league_name, position
 
-    player_data = complete_data[complete_data['Player Name'] == player_name]
 
-    player_metrics_df, positional_means_df = get_player_and_avg_metrics(complete_data, player_name, position,all_metrics)
-    stats1, stats2 = get_stat_values(all_metrics, player_metrics_df, positional_means_df)
+def create_radar_chart(complete_data, league_name,player_name, position, season, api='statbomb'):
+    return draw_radar_chart(*radar_chart_values(complete_data, league_name, player_name, position, season, api))
+
+
+def radar_average_label(league_name, position):
+    dis_league_name = league_name if league_name!='All' else 'All Leagues'
+    dis_league_name = f"Avg {dis_league_name} {position}"
+    if len(dis_league_name) > 25:
+        words = dis_league_name.split()
+        first_line = ''
+        second_line = ''
+        
+        for word in words:
+            # Check if adding the next word would exceed the 25-character limit for the first line
+            if len(first_line) + len(word) + 1 <= 25:
+                first_line += (word + ' ')
+            else:
+                second_line += (word + ' ')
+        
+        # Combine the two lines with '\n' between them
+        dis_league_name = first_line.strip() + '\n' + second_line.strip()
+    return dis_league_name
+
 
+def draw_radar_chart(all_metrics, stats1, stats2, player_name, team, minutes, league_name, position):
+    """
+    Draws the radar chart of a player's percentiles (stats1) against the positional
+    average (stats2). The artists that change from player to player are tagged with a
+    gid, see visualizations.svg_charts.
+    """
+    stats1, stats2 = list(stats1), list(stats2)
     num_vars = len(all_metrics)
     angles = np.linspace(0, 2 * np.pi, num_vars, endpoint=False).tolist()
     angles = [(angle + np.pi / 2) % (2 * np.pi) for angle in angles]
@@ -48,10 +83,10 @@ def create_radar_chart(complete_data, league_name,player_name, position, season,
     ax.set_yticklabels(y_ticks, color='grey', size=10)
     ax.set_ylim(0, 100)  # Set the limit of y-axis to 0-100
     ax.yaxis.grid(True, color='grey', linestyle='dashed')
-    ax.plot(angles, stats1, color='#1f77b4', linewidth=2, linestyle='solid')
-    ax.fill(angles, stats1, color='#1f77b4', alpha=0.25)
-    ax.plot(angles, stats2, color='#d62728', linewidth=2, linestyle='solid')
-    ax.fill(angles, stats2, color='#d62728', alpha=0.25)
+    ax.plot(angles, stats1, color='#1f77b4', linewidth=2, linestyle='solid', gid='player-line')
+    ax.fill(angles, stats1, color='#1f77b4', alpha=0.25, gid='player-fill')
+    ax.plot(angles, stats2, color='#d62728', linewidth=2, linestyle='solid', gid='average-line')
+    ax.fill(angles, stats2, color='#d62728', alpha=0.25, gid='average-fill')
 
     # Draw circles at specified intervals (20, 40, 60, 80, and a max circle for 100)
     for tick in [20, 40, 60, 80]:
@@ -79,8 +114,8 @@ def create_radar_chart(complete_data, league_name,player_name, position, season,
     ax.text(-0.15, 1.19, "Radar Comparison Chart", ha='left', va='center', 
             fontproperties=custom_fontt, fontsize=25, color='white', transform=ax.transAxes)
 
-    ax.text(1.3, 1.17, f"{player_name}\n{player_data.iloc[0]['Team']} Club\n{int(player_data.iloc[0]['Minutes'])} Min.", ha='right', va='center', 
-            fontproperties=custom_fontt, fontsize=14, color='#1f77b4', alpha=0.8, transform=ax.transAxes)
+    ax.text(1.3, 1.17, f"{player_name}\n{team} Club\n{minutes} Min.", ha='right', va='center', 
+            fontproperties=custom_fontt, fontsize=14, color='#1f77b4', alpha=0.8, transform=ax.transAxes, gid='player-header')
 
     ax.text(-0.15, 1.14, "Players' Metrics vs Mean Positional Peers", 
             ha='left', va='center', fontproperties=custom_fontt, fontsize=12, color='white', alpha=0.5, transform=ax.transAxes)
@@ -88,23 +123,7 @@ def create_radar_chart(complete_data, league_name,player_name, position, season,
     # Add a horizontal line at the top
     fig1.add_artist(plt.Line2D((0, 1.2), (0.935, 0.935), color='white', linewidth=2.5, alpha=0.8, transform=fig1.transFigure))
 
-    dis_league_name = league_name if league_name!='All' else 'All Leagues'
-    dis_league_name = f"Avg {dis_league_name} {position}"
-    if len(dis_league_name) > 25:
-        words = dis_league_name.split()
-        first_line = ''
-        second_line = ''
-        
-        for word in words:
-            # Check if adding the next word would exceed the 25-character limit for the first line
-            if len(first_line) + len(word) + 1 <= 25:
-                first_line += (word + ' ')
-            else:
-                second_line += (word + ' ')
-        
-        # Combine the two lines with '\n' between them
-        dis_league_name = first_line.strip() + '\n' + second_line.strip()
-
+    dis_league_name = radar_average_label(league_name, position)
 
     legend_elements_2 = [
         Patch(facecolor='#1f77b4', edgecolor='gray', label=f"{player_name}"),
@@ -112,6 +131,8 @@ def create_radar_chart(complete_data, league_name,player_name, position, season,
         Patch(facecolor='#2E2E2A', label='')]
 
     combined_legend_elements = legend_elements_2
-    ax.legend(handles=combined_legend_elements, loc='lower right', bbox_to_anchor=(1.40, 0), fontsize=12, frameon=False, labelcolor='white')
+    legend = ax.legend(handles=combined_legend_elements, loc='lower right', bbox_to_anchor=(1.40, 0), fontsize=12, frameon=False, labelcolor='white')
+    legend.set_gid('legend')
+    legend.get_texts()[0].set_gid('legend-player')
 
     return fig1
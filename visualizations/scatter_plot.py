@@ -1,24 +1,17 @@
 import pandas as pd
 import matplotlib.pyplot as plt
-from utilities.utils import custom_fontt
+import plotly.graph_objects as go
+from utilities.utils import custom_fontt, get_player_season_query
 import numpy as np
 
-def create_scatter_chart(df, league, season, player, player_position, x_metric, y_metric, min_age, max_age, min_minutes, max_minutes, api='statbomb'):
-
-    if player_position == 'Number 6' and api=='statbomb':
-        player_position = 'Number 8'
-    
-    if (player_position == 'Number 8' or player_position == 'Number 10') and api=='wyscout':
-        player_position = 'Number 6'
-
-
-    player_df = df[df["Player Name"] == player]
-    if league not in ['All', '']:
-        df = df[df['League'] == league]    
-    if season!='':
-        df = df[df['Season']==season]
-
-    df = df[df['Position'] == player_position]
+def scatter_chart_data(df, league, season, player, player_position, x_metric, y_metric, min_age, max_age, min_minutes, max_minutes, api='statbomb'):
+    """
+    The players of the scatter chart: the peer group within the age and minutes ranges,
+    plus the chosen player, with the percentile of both metrics within those players.
+    """
+    query = get_player_season_query(df, api)
+    player_df = query.player_rows(player)
+    df = query.peer_group(league, season, player_position)
     df = df[(df['Minutes'] >= min_minutes) & (df['Minutes'] <= max_minutes)]
     df = df[(df['Age'] >= min_age) & (df['Age'] <= max_age)]
 
@@ -31,14 +24,21 @@ def create_scatter_chart(df, league, season, player, player_position, x_metric,
     # Calculate percentiles
     for metric in [x_metric, y_metric]:
         df[f'{metric}_percentile'] = df[metric].rank(pct=True) * 100
+    return df
+
+
+def top_percentile(league):
+    # Top performers are the top 3% of a league, or the top 5% across all leagues
+    return 97 if league != 'All' else 95
+
+
+def create_scatter_chart(df, league, season, player, player_position, x_metric, y_metric, min_age, max_age, min_minutes, max_minutes, api='statbomb'):
+
+    df = scatter_chart_data(df, league, season, player, player_position, x_metric, y_metric, min_age, max_age, min_minutes, max_minutes, api)
 
     # Scatter plot for all players
-    if league != 'All':
-        x_percentile = 97
-        y_percentile = 97
-    else:
-        x_percentile = 95
-        y_percentile = 95
+    x_percentile = top_percentile(league)
+    y_percentile = top_percentile(league)
 
     top_x_players = df[df[f'{x_metric}_percentile'] >= x_percentile]
     top_y_players = df[df[f'{y_metric}_percentile'] >= y_percentile]
@@ -129,3 +129,93 @@ def create_scatter_chart(df, league, season, player, player_position, x_metric,
 
     # Return the figure object
     return fig
+
+
+def player_hover_data(df, x_metric, y_metric):
+    """
+    Hover text of every player: the names as one string per player, and the numbers as
+    a numeric array, which plotly sends to the browser as binary rather than text.
+    """
+    labels = df['Player Name'].astype(str)
+    for column in ['Team', 'League', 'Season']:
+        if column in df.columns:
+            labels = labels + '<br>' + df[column].astype(str)
+    numbers = np.column_stack([
+        df['Age'].to_numpy(dtype=float), df['Minutes'].to_numpy(dtype=float),
+        df[f'{x_metric}_percentile'].to_numpy(), df[f'{y_metric}_percentile'].to_numpy(),
+    ]).astype('float32')
+    hovertemplate = '<br>'.join([
+        '<b>%{text}</b>',
+        'Age: %{customdata[0]:.0f}  |  Minutes: %{customdata[1]:.0f}',
+        f'{x_metric}: %{{x:.2f}} (%{{customdata[2]:.0f}} pct)',
+        f'{y_metric}: %{{y:.2f}} (%{{customdata[3]:.0f}} pct)',
+    ]) + '<extra></extra>'
+    return labels.to_numpy(), numbers, hovertemplate
+
+
+def create_interactive_scatter_chart(df, league, season, player, player_position, x_metric, y_metric, min_age, max_age, min_minutes, max_minutes, api='statbomb'):
+    """
+    Interactive version of create_scatter_chart as a plotly figure. Every player is
+    drawn with WebGL (Scattergl) and described in a hover tooltip rather than an
+    annotation, so it stays responsive with tens of thousands of players. Top
+    performers are worked out here and drawn as their own trace.
+
+    Parameters:
+        Same as create_scatter_chart.
+
+    Returns:
+        go.Figure: The scatter chart, for st.plotly_chart.
+    """
+    df = scatter_chart_data(df, league, season, player, player_position, x_metric, y_metric, min_age, max_age, min_minutes, max_minutes, api)
+
+    top = ((df[f'{x_metric}_percentile'] >= top_percentile(league)) | (df[f'{y_metric}_percentile'] >= top_percentile(league))).to_numpy()
+    chosen = (df['Player Name'] == player).to_numpy()
+    labels, customdata, hovertemplate = player_hover_data(df, x_metric, y_metric)
+    x_values, y_values = df[x_metric].to_numpy(), df[y_metric].to_numpy()
+
+    fig = go.Figure()
+    for name, mask, marker in [
+        ('Players', ~top & ~chosen, dict(color='#83bd8e', size=9, opacity=0.25, line=dict(color='black', width=1))),
+        ('Top Performers', top & ~chosen, dict(color='#358244', size=11, opacity=0.6, line=dict(color='grey', width=1))),
+        (player, chosen, dict(color='red', size=13, opacity=0.8, line=dict(color='black', width=1))),
+    ]:
+        fig.add_trace(go.Scattergl(
+            x=x_values[mask], y=y_values[mask], mode='markers', name=name, marker=marker,
+            text=labels[mask], customdata=customdata[mask], hovertemplate=hovertemplate
+        ))
+
+    # Only the chosen player is labelled, everyone else is named on hover
+    if chosen.any():
+        fig.add_annotation(x=x_values[chosen][0], y=y_values[chosen][0], text=player, showarrow=False,
+                           xanchor='left', yanchor='bottom', font=dict(color='white', size=11))
+
+    fig.add_hline(y=y_values.mean(), line=dict(color='white', dash='dot', width=1))
+    fig.add_vline(x=x_values.mean(), line=dict(color='white', dash='dot', width=1))
+    for x, y, xanchor, yanchor, text in [
+        (1, 1, 'right', 'top', f'High {x_metric}, High {y_metric}'),
+        (1, 0, 'right', 'bottom', f'High {x_metric}, Low {y_metric}'),
+        (0, 1, 'left', 'top', f'Low {x_metric}, High {y_metric}'),
+        (0, 0, 'left', 'bottom', f'Low {x_metric}, Low {y_metric}'),
+    ]:
+        fig.add_annotation(x=x, y=y, xref='paper', yref='paper', xanchor=xanchor, yanchor=yanchor, text=text,
+                           showarrow=False, font=dict(color='green', size=10))
+
+    fig.update_layout(
+        title=dict(text=f'{y_metric}  vs.  {x_metric}', x=0.5, xanchor='center', font=dict(size=20)),
+        xaxis_title=x_metric, yaxis_title=y_metric,
+        paper_bgcolor='#222222', plot_bgcolor='#222222', font=dict(color='white'),
+        xaxis=dict(showgrid=False, zeroline=False, linecolor='white'),
+        yaxis=dict(showgrid=False, zeroline=False, linecolor='white'),
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+        hoverlabel=dict(bgcolor='#2E2E2A'),
+        height=700, margin=dict(b=110),
+    )
+    fig.add_annotation(
+        x=0, y=-0.16, xref='paper', yref='paper', xanchor='left', yanchor='top', showarrow=False, align='left',
+        text=f"Chosen Leagues :- {league}<br>Chosen Position :- {player_position}", font=dict(size=10, color='rgba(255,255,255,0.6)')
+    )
+    fig.add_annotation(
+        x=1, y=-0.16, xref='paper', yref='paper', xanchor='right', yanchor='top', showarrow=False, align='right',
+        text=f"Age Range :- {min_age} - {max_age}<br>Minutes Range :- {min_minutes} - {max_minutes}", font=dict(size=10, color='rgba(255,255,255,0.6)')
+    )
+    return fig
@@ -1,4 +1,8 @@
-from utilities.utils import get_metrics_by_position
+import io
+import numpy as np
+import pandas as pd
+from utilities.utils import get_metrics_by_position, get_player_season_query, get_similarity_index
+from utilities.export import unique_sheet_name
 
 
 def filter_similar_players(df, player_name, league_name, season, position, similarity_threshold, max_age, api="statbomb"):
@@ -13,50 +17,70 @@ def filter_similar_players(df, player_name, league_name, season, position, simil
         max_age (int): The maximum age limit for players to be considered in the filtered results.
 
     Returns:
-        pd.DataFrame: DataFrame with players that match the similarity criteria.
+        pd.DataFrame: DataFrame with players that match the similarity criteria, with the
+        number of matched conditions and a 0-100 similarity score to rank them by.
     """
+    num_columns = get_metrics_by_position(position, api)
+    df = get_player_season_query(df, api).peer_group(league_name, season, position)
+
+    columns = ['Player Name', 'Team', 'League', 'Minutes', 'Age', 'Position'] + num_columns
+    df = df[columns]
+
     # Extract the selected player's metrics as reference
+    selected = df.loc[df['Player Name'] == player_name]
+    if selected.empty:
+        raise ValueError(f'Player {player_name} not found.')
+    selected_player = selected.iloc[0]
+    thresholds = np.array([selected_player[metric] * similarity_threshold for metric in num_columns])
 
-    num_columns = get_metrics_by_position(position, api)
+    values = df[num_columns].to_numpy()
+    candidates = (df['Player Name'] != player_name).to_numpy() & (df['Age'] < max_age).to_numpy()
 
-    if position == 'Number 6' and api=='statbomb':
-        position = 'Number 8'
+    # One counter for the player's own row plus one per metric at or above the threshold
+    match_count = 1 + (values >= thresholds).sum(axis=1)
+    matching = candidates & (match_count >= 10)
 
-    if (position == 'Number 8' or position == 'Number 10') and api=='wyscout':
-        position = 'Number 6'
+    # Similarity is based on the root mean squared difference of the metric z-scores
+    # within the peer group, 100 meaning an identical profile
+    values = values.astype('float64')
+    std = np.nanstd(values, axis=0)
+    std[~(std > 0)] = 1
+    reference = selected_player[num_columns].to_numpy(dtype='float64')
+    distance = np.sqrt(np.nanmean(((values - reference) / std) ** 2, axis=1))
 
-    if league_name not in ['All', '']:
-        df = df[df['League'] == league_name]    
-    if season!='':
-        df = df[df['Season']==season]
-    df = df[df['Position'] == position]
+    df = df.loc[matching, ['Player Name', 'Team', 'League', 'Minutes', 'Age', 'Position']].reset_index(drop=True)
+    df['Matched Metrics'] = match_count[matching]
+    df['Similarity'] = (100 / (1 + distance[matching])).round(1)
+    return df
 
-    columns = ['Player Name', 'Team', 'League', 'Minutes', 'Age', 'Position'] + num_columns
 
-    df = df[columns]
+def batch_similar_players(df, targets, k=10, max_age=None, leagues=None, api="statbomb"):
+    """
+    Similar players for a whole squad or shortlist in one pass over the similarity index.
 
-    selected_player = df.loc[df['Player Name'] == player_name].iloc[0]
-    df = df[df['Player Name']!= player_name]
-
-    # List to hold indices of rows that match the similarity conditions
-    matching_indices = []
-
-    # Iterate through each player in the DataFrame
-    for idx, row in df.iterrows():
-        if row['Age'] >= max_age:
-            continue  # Skip this player if the age is equal to or above max_age
-        
-        match_count = 1  # Counter for satisfied metric conditions
-        
-        for metric in num_columns:
-            threshold_value = selected_player[metric] * similarity_threshold
-            if row[metric] >= threshold_value:
-                match_count += 1
-    
-        # Match if enough conditions are met
-        if match_count >= 10:  # Can adjust this threshold based on your needs
-            matching_indices.append(idx)
-
-    # Final result with matching players and their similarity score
-    df = df[['Player Name', 'Team', 'League', 'Minutes', 'Age', 'Position',]]
-    return df.loc[matching_indices].reset_index(drop=True)
+    Parameters:
+        df (pd.DataFrame): DataFrame containing player data with metrics.
+        targets (pd.DataFrame): Rows of the players to find replacements for, with
+            'Player Name', 'Position', 'League' and 'Season'.
+        k (int): Number of similar players per target.
+        max_age (int): Only list players younger than this.
+        leagues (list): Only list players from these leagues, every league when empty.
+
+    Returns:
+        (pd.DataFrame, list): The combined lists and the targets that were skipped.
+    """
+    return get_similarity_index(df, api).similar_players_batch(targets, k=k, leagues=leagues, max_age=max_age)
+
+
+def similar_players_workbook(similar_players_df):
+    """
+    Excel workbook with every list on one sheet followed by one sheet per target.
+    """
+    excel_buffer = io.BytesIO()
+    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
+        similar_players_df.to_excel(writer, index=False, sheet_name='All Targets')
+        sheet_names = {'All Targets'}
+        for target, target_df in similar_players_df.groupby('Target', sort=False):
+            sheet_name = unique_sheet_name(target, sheet_names)
+            target_df.drop(columns=['Target']).to_excel(writer, index=False, sheet_name=sheet_name)
+    return excel_buffer.getvalue()
@@ -0,0 +1,448 @@
+"""
+Template based SVG rendering of the pizza and radar charts.
+
+A chart layout (its metrics, and for the radar the average's legend label) is drawn
+once by the matplotlib code in pizza_chart / radar_chart with placeholder values and
+saved as SVG. The artists tagged with a gid there (slices, polygons, player texts)
+are cut out of that SVG, leaving static markup with named slots. Rendering a player
+then only fills the slots: slice wedges and polygons from the percentiles, and the
+player's texts as glyph outlines from the same font. The backgrounds, rings, labels
+and legends are never redrawn, and no matplotlib figure is created.
+
+Glyphs come from matplotlib's text-to-path layout, whose interface isn't stable
+across releases, so it's only used by text_glyphs and only on the matplotlib versions
+in glyph_layout_versions. Every template is also checked by filling it with the
+values it was drawn with and comparing the texts to matplotlib's own SVG of them.
+Charts whose template can't be used are drawn by matplotlib instead.
+"""
+import base64
+import logging
+import re
+import threading
+import xml.etree.ElementTree as ET
+import matplotlib
+import numpy as np
+from matplotlib import font_manager
+from matplotlib.path import Path
+from matplotlib.textpath import text_to_path
+from utilities.chart_cache import render_figure
+from visualizations.pizza_chart import draw_pizza_chart, pizza_chart_values, pizza_slice_color
+from visualizations.radar_chart import draw_radar_chart, radar_chart_values, radar_average_label
+
+svg_ns = 'http://www.w3.org/2000/svg'
+xlink_ns = 'http://www.w3.org/1999/xlink'
+ET.register_namespace('', svg_ns)
+ET.register_namespace('xlink', xlink_ns)
+
+logger = logging.getLogger(__name__)
+
+# matplotlib releases (major, minor) whose text-to-path layout text_glyphs is written
+# against, from the first whose get_font takes fallback fonts
+glyph_layout_versions = ((3, 6), (3, 11))
+
+# Values the templates are drawn with, replaced for every player
+placeholder_percentile = 50
+placeholder_text = 'X'
+
+_templates = {}
+_templates_lock = threading.Lock()
+# Glyph outlines by matplotlib's glyph id, and as SVG path data, shared by every template
+_glyph_paths = {}
+_glyph_data = {}
+
+
+def text_width(text, prop):
+    if not text:
+        return 0.0
+    return text_to_path.get_text_width_height_descent(text, prop, ismath=False)[0]
+
+
+def glyph_layout_supported():
+    first, last = glyph_layout_versions
+    return first <= tuple(matplotlib.__version_info__[:2]) <= last
+
+
+def text_glyphs(text, prop):
+    """
+    The glyphs of one line of text as matplotlib's SVG backend lays them out: a list of
+    (glyph id, x, y, scale) in font units, and the outlines of the glyphs not seen
+    before, by glyph id. The only use of matplotlib's text-to-path internals.
+    """
+    # The font of prop's first family found, falling back to its other families for
+    # glyphs the first one lacks
+    paths = []
+    for family in prop.get_family():
+        family_prop = prop.copy()
+        family_prop.set_family(family)
+        try:
+            paths.append(font_manager.findfont(family_prop, fallback_to_default=False))
+        except ValueError:
+            pass
+    font = font_manager.get_font(list(dict.fromkeys(paths)) or [font_manager.findfont(prop)])
+    font.set_size(text_to_path.FONT_SCALE, text_to_path.DPI)
+    glyph_info, glyph_map, _ = text_to_path.get_glyphs_with_font(font, text, glyph_map=_glyph_paths,
+                                                                  return_new_glyphs_only=True)
+    return glyph_info, glyph_map
+
+
+def path_data(vertices, codes):
+    # SVG path commands for a matplotlib path, in the same form matplotlib writes them
+    commands = []
+    i = 0
+    while i < len(codes):
+        code = codes[i]
+        if code == Path.MOVETO:
+            commands.append('M %f %f' % tuple(vertices[i]))
+            i += 1
+        elif code == Path.LINETO:
+            commands.append('L %f %f' % tuple(vertices[i]))
+            i += 1
+        elif code == Path.CURVE3:
+            commands.append('Q %f %f %f %f' % (*vertices[i], *vertices[i + 1]))
+            i += 2
+        elif code == Path.CURVE4:
+            commands.append('C %f %f %f %f %f %f' % (*vertices[i], *vertices[i + 1], *vertices[i + 2]))
+            i += 3
+        else:
+            commands.append('z')
+            i += 1
+    return ' '.join(commands)
+
+
+def glyph_id(glyph_repr):
+    # Same ids as matplotlib gives its glyph definitions, so a template's glyphs are reused
+    return glyph_repr.replace('%20', '_')
+
+
+def text_markup(text, style, x, y, scale, prop, defined):
+    """
+    One line of text as glyphs, positioned like matplotlib positions it (translate to
+    the start of the baseline, scaled from the glyphs' font units). Glyphs are
+    referenced by id, and defined along with the text unless their id is in defined,
+    which is updated.
+    """
+    if not text:
+        return ''
+    glyph_info, glyph_map = text_glyphs(text, prop)
+    _glyph_paths.update(glyph_map)
+    for glyph_repr, (vertices, codes) in glyph_map.items():
+        _glyph_data[glyph_repr] = path_data(vertices, codes)
+
+    markup = []
+    new_glyphs = [glyph_repr for glyph_repr, _, _, _ in glyph_info if glyph_id(glyph_repr) not in defined]
+    if new_glyphs:
+        markup.append('<defs>')
+        for glyph_repr in dict.fromkeys(new_glyphs):
+            markup.append(f'<path id="{glyph_id(glyph_repr)}" d="{_glyph_data[glyph_repr]}"/>')
+            defined.add(glyph_id(glyph_repr))
+        markup.append('</defs>')
+    markup.append(f'<g style="{style}" transform="translate({x:f} {y:f}) scale({scale:g} -{scale:g})">')
+    for glyph_repr, x_position, y_position, _ in glyph_info:
+        markup.append(f'<use xlink:href="#{glyph_id(glyph_repr)}" x="{x_position:f}" y="{y_position:f}"/>')
+    markup.append('</g>')
+    return ''.join(markup)
+
+
+def glyph_position(use):
+    # matplotlib moves a glyph by its transform, text_markup by its x and y
+    translate = re.fullmatch(r'(?:translate\(([-\d.e]+)(?:,? ([-\d.e]+))?\))?', use.get('transform', ''))
+    if translate is None:
+        raise ValueError(f"Unexpected glyph transform '{use.get('transform')}' in matplotlib's SVG")
+    x, y = translate.groups()
+    return float(use.get('x', 0)) + float(x or 0), float(use.get('y', 0)) + float(y or 0)
+
+
+def text_groups(element):
+    """
+    The lines of text in element as (style, (x, y, scale), [(glyph id, x, y)]), read
+    from the groups matplotlib writes per line.
+    """
+    groups = []
+    for group in element.findall(f'{{{svg_ns}}}g'):
+        transform = re.fullmatch(r'translate\(([-\d.e]+),? ([-\d.e]+)\) scale\(([-\d.e]+),? -\3\)', group.get('transform', ''))
+        if transform is None:
+            raise ValueError(f"Unexpected text transform '{group.get('transform')}' in matplotlib's SVG")
+        glyphs = [(use.get(f'{{{xlink_ns}}}href'), *glyph_position(use)) for use in group.iter(f'{{{svg_ns}}}use')]
+        groups.append((group.get('style'), tuple(map(float, transform.groups())), glyphs))
+    return groups
+
+
+def same_text_groups(groups, expected):
+    if len(groups) != len(expected):
+        return False
+    for (style, transform, glyphs), (expected_style, expected_transform, expected_glyphs) in zip(groups, expected):
+        if style != expected_style or not np.allclose(transform, expected_transform, atol=1e-3):
+            return False
+        if [href for href, _, _ in glyphs] != [href for href, _, _ in expected_glyphs]:
+            return False
+        if glyphs and not np.allclose([xy for _, *xy in glyphs], [xy for _, *xy in expected_glyphs], atol=1e-3):
+            return False
+    return True
+
+
+class SvgChartTemplate:
+    """
+    A chart drawn once by matplotlib, cut into static SVG markup and named slots.
+
+    Parameters:
+        fig: The chart drawn with placeholder values.
+        ax: Its polar axes, used to map (theta, r) data points to SVG coordinates.
+        slots (list): gids of the artists replaced for every player.
+        texts (dict): gid -> (matplotlib Text, placeholder lines) of the slots that are texts.
+        attribute_slots (dict): gid -> attribute of an element that is set for every player.
+    """
+
+    def __init__(self, fig, ax, slots, texts, attribute_slots=None):
+        attribute_slots = attribute_slots or {}
+        self.theta_offset = ax.get_theta_offset()
+        self.theta_direction = ax.get_theta_direction()
+        self.rorigin = ax.get_rorigin()
+        self.text_props = {gid: text.get_fontproperties() for gid, (text, _) in texts.items()}
+
+        # Probe points of known data coordinates give the data to SVG mapping
+        probes = [(0.0, 0.0), (0.0, 100.0), (np.pi / 2, 100.0)]
+        ax.set_autoscale_on(False)
+        ax.plot([theta for theta, _ in probes], [r for _, r in probes], linestyle='none', marker='o',
+                clip_on=False, gid='probes')
+        root = ET.fromstring(render_figure(fig, 'svg'))
+        parents = {child: parent for parent in root.iter() for child in parent}
+        elements = {element.get('id'): element for element in root.iter() if element.get('id')}
+
+        # Glyph outlines are defined where a glyph is first used, which may be a slot,
+        # so every definition is moved to the top before slots are emptied
+        hoisted = ET.Element(f'{{{svg_ns}}}defs')
+        for defs in [element for element in root.iter(f'{{{svg_ns}}}defs')]:
+            hoisted.extend(list(defs))
+            parents[defs].remove(defs)
+        root.insert(0, hoisted)
+        self.glyph_ids = {element.get('id') for element in hoisted if element.get('id')}
+        for metadata in root.findall(f'{{{svg_ns}}}metadata'):
+            root.remove(metadata)
+
+        probe_points = [(float(use.get('x')), float(use.get('y'))) for use in elements['probes'].iter(f'{{{svg_ns}}}use')]
+        cartesian = np.array([self.cartesian(theta, r) for theta, r in probes])
+        self.affine = np.linalg.lstsq(np.c_[cartesian, np.ones(len(probes))], np.array(probe_points), rcond=None)[0]
+        self.unit = np.hypot(*self.affine[0])
+        parents[elements['probes']].remove(elements['probes'])
+
+        self.paths = {}
+        self.lines = {}
+        drawn = {}
+        for gid in slots:
+            element = elements[gid]
+            if gid in texts:
+                # One group per line, translate(x y) scale(k -k)
+                self.lines[gid] = []
+                drawn[gid] = text_groups(element)
+                for style, (x, y, scale), _ in drawn[gid]:
+                    self.lines[gid].append((style, x, y, scale))
+            else:
+                path = element.find(f'{{{svg_ns}}}path')
+                self.paths[gid] = dict(path.attrib) if path is not None else None
+            for child in list(element):
+                element.remove(child)
+            element.text = f'@@{gid}@@'
+
+        # Right-aligned texts keep their right edge, so remember where it is
+        self.right_edges = {
+            gid: [x + text_width(line, self.text_props[gid]) for (_, x, _, _), line in zip(self.lines[gid], placeholders)]
+            for gid, (text, placeholders) in texts.items() if text.get_horizontalalignment() == 'right'
+        }
+
+        # The placeholders must come out as matplotlib drew them, else the glyph
+        # layout here has drifted from matplotlib's
+        for gid, (_, placeholders) in texts.items():
+            filled = ET.fromstring(f'<g xmlns="{svg_ns}" xmlns:xlink="{xlink_ns}">'
+                                   f'{self.text_lines(gid, placeholders, set(self.glyph_ids))}</g>')
+            if not same_text_groups(text_groups(filled), drawn[gid]):
+                raise ValueError(f"Text '{gid}' of the template doesn't match matplotlib's SVG")
+
+        for gid, attribute in attribute_slots.items():
+            elements[gid].set(attribute, f'@@{gid}@@')
+
+        markup = ET.tostring(root, encoding='unicode')
+        self.chunks = re.split(r'@@([\w-]+)@@', markup)
+
+    def cartesian(self, theta, r):
+        angle = self.theta_offset + self.theta_direction * theta
+        radius = r - self.rorigin
+        return radius * np.cos(angle), radius * np.sin(angle)
+
+    def point(self, theta, r):
+        x, y = self.cartesian(theta, r)
+        return x * self.affine[0, 0] + y * self.affine[1, 0] + self.affine[2, 0], x * self.affine[0, 1] + y * self.affine[1, 1] + self.affine[2, 1]
+
+    def path_markup(self, gid, d, style=None):
+        attributes = dict(self.paths[gid])
+        attributes['d'] = d
+        if style is not None:
+            attributes['style'] = style
+        return '<path ' + ' '.join(f'{key}="{value}"' for key, value in attributes.items()) + '/>'
+
+    def wedge_data(self, theta1, theta2, r1, r2):
+        # Ring sector between two angles and two radii, with circular arcs
+        center = self.point(0.0, self.rorigin)
+        start_inner, end_inner = self.point(theta1, r1), self.point(theta2, r1)
+        start_outer, end_outer = self.point(theta1, r2), self.point(theta2, r2)
+        cross = (end_inner[0] - center[0]) * (start_inner[1] - center[1]) - (end_inner[1] - center[1]) * (start_inner[0] - center[0])
+        sweep = 1 if cross < 0 else 0
+        radius_inner, radius_outer = (r1 - self.rorigin) * self.unit, (r2 - self.rorigin) * self.unit
+        return (f'M {start_inner[0]:f} {start_inner[1]:f} A {radius_inner:f} {radius_inner:f} 0 0 {sweep} {end_inner[0]:f} {end_inner[1]:f} '
+                f'L {end_outer[0]:f} {end_outer[1]:f} A {radius_outer:f} {radius_outer:f} 0 0 {1 - sweep} {start_outer[0]:f} {start_outer[1]:f} z')
+
+    def text_lines(self, gid, lines, defined):
+        markup = []
+        for i, ((style, x, y, scale), line) in enumerate(zip(self.lines[gid], lines)):
+            if gid in self.right_edges:
+                x = self.right_edges[gid][i] - text_width(line, self.text_props[gid])
+            markup.append(text_markup(line, style, x, y, scale, self.text_props[gid], defined))
+        return ''.join(markup)
+
+    def render(self, fills):
+        # Odd chunks are slot names
+        return ''.join(fills.get(chunk, '') if i % 2 else chunk for i, chunk in enumerate(self.chunks))
+
+
+def get_template(key, build):
+    """
+    The template built by build for key, or None when the chart has to be drawn by
+    matplotlib: on an unsupported matplotlib, or when the template doesn't match
+    matplotlib's SVG.
+    """
+    with _templates_lock:
+        if key not in _templates:
+            if not glyph_layout_supported():
+                logger.info("Drawing %s charts with matplotlib, text layout isn't supported on matplotlib %s",
+                            key[0], matplotlib.__version__)
+                _templates[key] = None
+                return None
+            try:
+                _templates[key] = build()
+            except ValueError as e:
+                logger.info("Drawing %s charts with matplotlib: %s", key[0], e)
+                _templates[key] = None
+        return _templates[key]
+
+
+def svg_fill_color(style, color):
+    return re.sub(r'fill: [^;]+', f'fill: {color}', style, count=1)
+
+
+def build_pizza_template(metrics, api):
+    n = len(metrics)
+    fig = draw_pizza_chart(metrics, [placeholder_percentile] * n, placeholder_text, placeholder_text, 0, 0, api)
+    ax = fig.axes[0]
+    slots = [f'slice-{i}' for i in range(n)] + [f'blank-{i}' for i in range(n)] + [f'value-{i}' for i in range(n)]
+    texts = {gid: (text, text.get_text().split('\n')) for gid, text in ((text.get_gid(), text) for text in fig.texts)
+             if gid in ['player-name', 'club', 'minutes']}
+    template = SvgChartTemplate(fig, ax, slots + list(texts), texts)
+    template.theta = np.linspace(0.0, 2 * np.pi, n, endpoint=False)
+    template.width = 2 * np.pi / n
+    return template
+
+
+def render_pizza_svg(metrics, values, player_name, team, minutes, age, api='statbomb'):
+    """
+    The pizza chart as SVG markup, looking like draw_pizza_chart's.
+    """
+    template = get_template(('pizza', api, tuple(metrics)), lambda: build_pizza_template(metrics, api))
+    if template is None:
+        return render_figure(draw_pizza_chart(metrics, values, player_name, team, minutes, age, api), 'svg').decode()
+    defined = set(template.glyph_ids)
+    fills = {
+        'player-name': template.text_lines('player-name', [str(player_name)], defined),
+        'club': template.text_lines('club', [f"Club: {team}"], defined),
+        'minutes': template.text_lines('minutes', [f"Minutes Played: {minutes}  |  Age: {age}"], defined),
+    }
+    for i, (theta, value) in enumerate(zip(template.theta, values)):
+        color = pizza_slice_color(value)
+        blank = template.paths[f'blank-{i}']
+        fills[f'blank-{i}'] = template.path_markup(f'blank-{i}', blank['d'], svg_fill_color(blank['style'], color))
+        if value is not None and not np.isnan(value):
+            wedge = template.wedge_data(theta - template.width / 2, theta + template.width / 2, 0, value)
+            fills[f'slice-{i}'] = template.path_markup(f'slice-{i}', wedge, svg_fill_color(template.paths[f'slice-{i}']['style'], color))
+    return template.render(fills)
+
+
+def build_radar_template(metrics, average_label):
+    n = len(metrics)
+    # The legend label of the average is part of the layout, so it's drawn for real
+    league_name, position = average_label
+    fig = draw_radar_chart(metrics, [placeholder_percentile] * n, [placeholder_percentile] * n,
+                           placeholder_text, placeholder_text, 0, league_name, position)
+    ax = fig.axes[0]
+    texts = {text.get_gid(): text for text in ax.texts if text.get_gid()}
+    legend = ax.get_legend()
+    texts['legend-player'] = legend.get_texts()[0]
+    text_slots = {
+        'player-header': (texts['player-header'], [placeholder_text, f"{placeholder_text} Club", "0 Min."]),
+        'legend-player': (texts['legend-player'], [placeholder_text]),
+    }
+    slots = ['player-line', 'player-fill', 'average-line', 'average-fill'] + list(text_slots)
+    template = SvgChartTemplate(fig, ax, slots, text_slots, attribute_slots={'legend': 'transform'})
+
+    # The legend is anchored at its right, so it moves left as its widest label grows
+    template.legend_prop = texts['legend-player'].get_fontproperties()
+    template.legend_labels = [text.get_text() for text in legend.get_texts()[1:]]
+    template.legend_width = max(legend_label_width(template, [placeholder_text]))
+    angles = np.linspace(0, 2 * np.pi, n, endpoint=False).tolist()
+    template.angles = [(angle + np.pi / 2) % (2 * np.pi) for angle in angles][::-1]
+    return template
+
+
+def legend_label_width(template, labels):
+    return [text_width(line, template.legend_prop) for label in labels + template.legend_labels for line in label.split('\n')]
+
+
+def polygon_data(template, angles, stats, closed):
+    points = [template.point(angle, stat) for angle, stat in zip(angles, stats) if stat is not None and not np.isnan(stat)]
+    if not points:
+        return ''
+    if closed:
+        return 'M ' + ' L '.join(f'{x:f} {y:f}' for x, y in points) + ' z'
+    points.append(points[0])
+    return 'M ' + ' L '.join(f'{x:f} {y:f}' for x, y in points)
+
+
+def render_radar_svg(metrics, stats1, stats2, player_name, team, minutes, league_name, position):
+    """
+    The radar chart as SVG markup, looking like draw_radar_chart's.
+    """
+    key = ('radar', tuple(metrics), radar_average_label(league_name, position))
+    template = get_template(key, lambda: build_radar_template(metrics, (league_name, position)))
+    if template is None:
+        return render_figure(draw_radar_chart(metrics, stats1, stats2, player_name, team, minutes, league_name, position), 'svg').decode()
+    stats1 = [np.nan if stat is None else float(stat) for stat in stats1]
+    stats2 = [np.nan if stat is None else float(stat) for stat in stats2]
+    defined = set(template.glyph_ids)
+    fills = {
+        'player-line': template.path_markup('player-line', polygon_data(template, template.angles, stats1, False)),
+        'player-fill': template.path_markup('player-fill', polygon_data(template, template.angles, stats1, True)),
+        'average-line': template.path_markup('average-line', polygon_data(template, template.angles, stats2, False)),
+        'average-fill': template.path_markup('average-fill', polygon_data(template, template.angles, stats2, True)),
+        'player-header': template.text_lines('player-header', [str(player_name), f"{team} Club", f"{minutes} Min."], defined),
+        'legend-player': template.text_lines('legend-player', [str(player_name)], defined),
+        'legend': f'translate({template.legend_width - max(legend_label_width(template, [str(player_name)])):f} 0)',
+    }
+    return template.render(fills)
+
+
+def create_pizza_svg(complete_data, league_name, season, player_name, position, api="statbomb"):
+    """
+    create_pizza_chart rendered through the SVG template, as UTF-8 SVG bytes.
+    """
+    return render_pizza_svg(*pizza_chart_values(complete_data, league_name, season, player_name, position, api), api=api).encode()
+
+
+def create_radar_svg(complete_data, league_name, player_name, position, season, api='statbomb'):
+    """
+    create_radar_chart rendered through the SVG template, as UTF-8 SVG bytes.
+    """
+    return render_radar_svg(*radar_chart_values(complete_data, league_name, player_name, position, season, api)).encode()
+
+
+def svg_image_html(svg):
+    """
+    An <img> showing SVG bytes at the full width of its container, for st.markdown.
+    """
+    return f'<img src="data:image/svg+xml;base64,{base64.b64encode(svg).decode()}" style="width: 100%"/>'
@@ -1,16 +1,13 @@
-from visualizations.overall_rank import get_overall_rank
-from utilities.utils import get_weighted_score
+from utilities.leaderboard import get_weighted_leaderboard
+from utilities.utils import league_rankings
 
 def get_weighted_rank(data, player_name, league_name, season, position, api='statbomb'):
-    data = get_overall_rank(data, league_name, season, position, api)
-    data = data[data['Player Name'] == player_name]
-    points_of_this_league = get_weighted_score(league_name)
-    points_of_league_Two = get_weighted_score("League Two")
-
-    factor = points_of_this_league/points_of_league_Two
+    if league_name not in league_rankings:
+        raise ValueError(f"No league coefficient for '{league_name}'")
 
-    data = data[['Player Name', 'Age', 'Minutes', 'Overall Score']]
-    data['Score weighted aganist League Two'] =  data['Overall Score']*factor
+    data = get_weighted_leaderboard(data, api).scores(league_name, season, position, reference_league="League Two")
+    data = data[data['Player Name'] == player_name]
+    data = data.rename(columns={'Score weighted against League Two': 'Score weighted aganist League Two'})
     data.reset_index(drop=True, inplace=True)
 
     return data[['Player Name', 'Age', 'Minutes', 'Overall Score', 'Score weighted aganist League Two']]